@@ -0,0 +1,73 @@
+"""
+Memory per call of the runtime helpers and of the representative page, measured with tracemalloc.
+
+`retained` is the size of the result, `peak` is the peak of temporaries during the call.
+The same cases as in the suite.py. The gates are in tests/test_alloc.py.
+
+    python benchmarks/bench_alloc.py
+"""
+
+import gc
+import tracemalloc
+from typing import Any, Callable
+
+import htmf as ht
+from suite import CASES, ROWS, SAFE
+
+N = 200
+
+
+def measure(func: Callable[[], Any]) -> tuple[float, int]:
+    results: list[Any] = [None] * N
+    for _ in range(100):
+        func()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        for i in range(N):
+            results[i] = func()
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (retained - start) / N, peak - base
+
+
+def page():
+    def row(r: dict[str, Any]):
+        return ht.m(
+            f"""
+            <tr { ht.attr({"class": ht.c("row", r["qty"] > 25 and "row--big"), "data-id": r["qty"]}) }>
+                <td>{ ht.t(r["name"]) }</td>
+                <td class="num">{ ht.t(r["qty"]) }</td>
+            </tr>
+            """
+        )
+
+    return ht.document(
+        f"""
+        <!DOCTYPE html>
+        <html>
+            <head><title>{ ht.t("Report <all>") }</title></head>
+            <body>
+                <nav>{ ht.t(ht.m(f"<a { ht.attr(href=f'/{ s }') }>{ ht.t(s) }</a>") for s in SAFE[:10]) }</nav>
+                <table>{ ht.t(row(r) for r in ROWS) }</table>
+            </body>
+        </html>
+        """
+    )
+
+
+def main():
+    print(f"{'case':<32} {'retained':>10} {'peak':>10}")
+    for name, func in {**CASES, "page.report": page}.items():
+        retained, peak = measure(func)
+        print(f"{name:<32} {retained:>10.0f} {peak:>10}")
+
+
+if __name__ == "__main__":
+    main()
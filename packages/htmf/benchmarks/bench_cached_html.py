@@ -0,0 +1,104 @@
+"""
+Plain vs `cached_html`-memoized `__html__` on the list-heavy page.
+
+Every row shows the price, the owner chip and the date. The same objects appear in the rows,
+the summary and the filters, as they do on the real pages.
+
+    python benchmarks/bench_cached_html.py
+"""
+
+import datetime
+import random
+import timeit
+
+import htmf as ht
+
+
+def make_classes(*, cached: bool):
+    deco = ht.cached_html if cached else (lambda f: f)
+
+    class Money:
+        __slots__ = ("_htmf_html", "cents", "currency")
+
+        def __init__(self, cents: int, currency: str):
+            self.cents = cents
+            self.currency = currency
+
+        @deco
+        def __html__(self):
+            return ht.m(
+                f"""<span class="money">{ ht.t(self.currency) } { self.cents // 100:,}.{ self.cents % 100:02}</span>"""
+            )
+
+    class UserChip:
+        __slots__ = ("_htmf_html", "avatar", "name")
+
+        def __init__(self, name: str, avatar: str):
+            self.name = name
+            self.avatar = avatar
+
+        @deco
+        def __html__(self):
+            return ht.m(
+                f"""<span { ht.attr({"class": "chip", "title": self.name}) }>"""
+                f"""<img { ht.attr(src=self.avatar, alt="") }>{ ht.t(self.name) }</span>"""
+            )
+
+    class Date:
+        __slots__ = ("_htmf_html", "value")
+
+        def __init__(self, value: datetime.date):
+            self.value = value
+
+        @deco
+        def __html__(self):
+            return ht.m(f"""<time datetime="{ self.value.isoformat() }">{ self.value.strftime("%d %b %Y") }</time>""")
+
+    return Money, UserChip, Date
+
+
+def make_page(*, cached: bool, n_rows: int):
+    Money, UserChip, Date = make_classes(cached=cached)
+    rnd = random.Random(1)
+    user_data = [(f"User <{ i }>", f"/avatars/{ i }.png") for i in range(20)]
+    date_data = [datetime.date(2024, 1, 1) + datetime.timedelta(days=i) for i in range(30)]
+    row_data = [(rnd.randint(100, 10**6), rnd.randrange(20), rnd.randrange(30)) for _ in range(n_rows)]
+
+    def row(price: Money, user: UserChip, date: Date):
+        return ht.m(f"<tr><td>{ ht.t(price) }</td><td>{ ht.t(user) }</td><td>{ ht.t(date) }</td></tr>")
+
+    # objects are loaded per request, so the memoized results live for one render only
+    def page():
+        users = [UserChip(*u) for u in user_data]
+        dates = [Date(d) for d in date_data]
+        rows = [(Money(cents, "EUR"), users[u], dates[d]) for cents, u, d in row_data]
+        top = max(rows, key=lambda r: r[0].cents)
+        return ht.m(
+            f"""
+            <table>
+                { ht.t(row(*r) for r in rows) }
+            </table>
+            <aside>
+                <ul>{ ht.t(ht.m(f"<li>{ ht.t(u) }</li>") for u in users) }</ul>
+                <ul>{ ht.t(ht.m(f"<li>{ ht.t(d) }</li>") for d in dates) }</ul>
+                <p>Top: { ht.t(top[0]) } by { ht.t(top[1]) }</p>
+            </aside>
+            """
+        )
+
+    return page
+
+
+def main():
+    print(f"{'rows':>6} {'plain ms':>10} {'cached ms':>10} {'saving':>8}")
+    for n_rows in (50, 200, 1000):
+        plain = make_page(cached=False, n_rows=n_rows)
+        cached = make_page(cached=True, n_rows=n_rows)
+        assert plain() == cached()
+        t_plain = min(timeit.repeat(plain, number=20, repeat=5)) / 20 * 1000
+        t_cached = min(timeit.repeat(cached, number=20, repeat=5)) / 20 * 1000
+        print(f"{n_rows:>6} {t_plain:>10.2f} {t_cached:>10.2f} {1 - t_cached / t_plain:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
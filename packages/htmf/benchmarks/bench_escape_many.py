@@ -0,0 +1,58 @@
+"""
+Per-item `escape` vs batch `escape_many`.
+
+Prints the nanoseconds per string for the growing batch sizes and the crossover point,
+i.e. the smallest batch where `escape_many` starts to win.
+
+    python benchmarks/bench_escape_many.py
+"""
+
+import random
+import string
+import timeit
+
+from htmf import escape, escape_many
+
+SIZES = (1, 2, 3, 4, 6, 8, 16, 64, 256, 4096)
+
+
+def mostly_safe(n: int, rnd: random.Random):
+    return ["".join(rnd.choices(string.ascii_letters, k=12)) for _ in range(n)]
+
+
+def escape_heavy(n: int, rnd: random.Random):
+    return ["".join(rnd.choices(string.ascii_letters + "<>&\"'", k=12)) for _ in range(n)]
+
+
+def repeated(n: int, rnd: random.Random):
+    return [rnd.choice(["active", "pending", "<none>", "Tom & Jerry"]) for _ in range(n)]
+
+
+def per_item(strings: list[str]):
+    return [escape(s) for s in strings]
+
+
+def ns_per_item(func, strings: list[str]) -> float:
+    number = max(1, 50_000 // len(strings))
+    best = min(timeit.repeat(lambda: func(strings), number=number, repeat=5))
+    return best / number / len(strings) * 1e9
+
+
+def main():
+    rnd = random.Random(42)
+    for dist in (mostly_safe, escape_heavy, repeated):
+        print(f"\n{dist.__name__}: ns per string")
+        print(f"{'n':>6} {'escape':>10} {'escape_many':>12}")
+        crossover = None
+        for n in SIZES:
+            strings = dist(n, rnd)
+            single = ns_per_item(per_item, strings)
+            batch = ns_per_item(escape_many, strings)
+            if crossover is None and batch < single:
+                crossover = n
+            print(f"{n:>6} {single:>10.1f} {batch:>12.1f}")
+        print(f"crossover: n = {crossover}")
+
+
+if __name__ == "__main__":
+    main()
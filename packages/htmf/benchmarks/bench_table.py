@@ -0,0 +1,51 @@
+"""
+Columnar `table` vs the per-cell `text` rendering of the report.
+
+    python benchmarks/bench_table.py [rows]
+"""
+
+import random
+import sys
+import timeit
+
+import htmf as ht
+
+STATUSES = ["active", "pending", "<archived>", "Tom & Jerry"]
+
+
+def make_columns(n_rows: int):
+    rnd = random.Random(42)
+    columns = {}
+    for i in range(4):
+        columns[f"status{ i }"] = [rnd.choice(STATUSES) for _ in range(n_rows)]
+    for i in range(4):
+        columns[f"name{ i }"] = [f"item <{ rnd.randrange(10**6) }>" for _ in range(n_rows)]
+    for i in range(2):
+        columns[f"qty{ i }"] = [rnd.randrange(1000) for _ in range(n_rows)]
+    for i in range(2):
+        columns[f"price{ i }"] = [rnd.random() * 1000 for _ in range(n_rows)]
+    return columns
+
+
+def per_cell(columns):
+    def tr(row):
+        return ht.m(f"<tr>{ ht.t(ht.m(f'<td>{ ht.t(v) }</td>') for v in row) }</tr>")
+
+    head = ht.t(ht.m(f"<th>{ ht.t(k) }</th>") for k in columns)
+    body = ht.t(tr(row) for row in zip(*columns.values()))
+    return ht.m(f"<table><thead><tr>{ head }</tr></thead><tbody>{ body }</tbody></table>")
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    columns = make_columns(n_rows)
+    assert ht.table(columns) == per_cell(columns)
+    t_cell = min(timeit.repeat(lambda: per_cell(columns), number=1, repeat=3))
+    t_table = min(timeit.repeat(lambda: ht.table(columns), number=1, repeat=3))
+    print(f"{n_rows} rows x {len(columns)} columns")
+    print(f"per-cell text: {t_cell * 1000:8.1f} ms")
+    print(f"table:         {t_table * 1000:8.1f} ms  ({t_cell / t_table:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Scaling of the page rendering over the threads. Every thread renders the same page tree in the loop.
+
+    python benchmarks/bench_threads.py [threads ...]
+
+Efficiency is the speedup over the single thread divided by the number of threads, 100% is the linear scaling.
+With GIL the threads take turns, expect ~1/N. Free-threaded Python (3.13t+) should stay close to 100%
+up to the number of cores.
+"""
+
+import os
+import sys
+import threading
+import time
+
+import htmf as ht
+from suite import ATTRS, CLASSES, HTML_OBJECTS, ROWS
+
+DURATION = 1.0
+
+
+@ht.component(maxsize=64)
+def card(i: int):
+    return ht.m(f"""<div { ht.attr(ATTRS, id=f"card-{ i }") }><h3>Card { i }</h3>{ ht.t(HTML_OBJECTS[:5]) }</div>""")
+
+
+def page():
+    rows = ht.t(
+        ht.m(f"<tr class='{ ht.c(*CLASSES) }'><td>{ ht.t(r['name']) }</td><td>{ ht.t(r['qty']) }</td></tr>")
+        for r in ROWS
+    )
+    cards = ht.t(card(i % 16) for i in range(32))
+    return ht.m(f"""<main><table>{ rows }</table><section>{ cards }</section></main>""")
+
+
+def run(n_threads: int) -> float:
+    """Pages per second rendered by all threads together"""
+    counts = [0] * n_threads
+    barrier = threading.Barrier(n_threads + 1)
+    stop = threading.Event()
+
+    def worker(i: int):
+        barrier.wait()
+        n = 0
+        while not stop.is_set():
+            page()
+            n += 1
+        counts[i] = n
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    for th in threads:
+        th.start()
+    barrier.wait()
+    start = time.perf_counter()
+    time.sleep(DURATION)
+    stop.set()
+    for th in threads:
+        th.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    counts = [int(a) for a in sys.argv[1:]] or sorted({1, 2, 4, 8, cpus} - {n for n in (2, 4, 8) if n > cpus})
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}, {cpus} CPUs")
+
+    expected = page()
+    pages = ht.parallel([page] * 8)
+    assert all(p == expected for p in pages)
+
+    base = None
+    print(f"{'threads':>7} {'pages/s':>10} {'speedup':>8} {'efficiency':>10}")
+    for n in counts:
+        rate = run(n)
+        base = base or rate
+        speedup = rate / base
+        print(f"{n:>7} {rate:>10.0f} {speedup:>7.2f}x {speedup / n:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Micro-benchmarks of the runtime helpers with the baseline comparison.
+
+    python benchmarks/suite.py                              # print the timings
+    python benchmarks/suite.py --save baseline.json         # store the baseline
+    python benchmarks/suite.py --compare baseline.json      # compare against it, exit code 1 on regression
+    python benchmarks/suite.py -k text --compare baseline.json
+
+Every case is timed `--repeat` times, the best run is the result and the interquartile range of runs is the noise.
+The case regresses if it's slower than the baseline by more than the `--threshold` and by more than
+the noise of both runs. The `ref.*` cases are the standard library reference points.
+"""
+
+import argparse
+import html
+import json
+import platform
+import random
+import statistics
+import string
+import sys
+import timeit
+from typing import Any, Callable
+
+import htmf as ht
+
+rnd = random.Random(42)
+
+
+def mostly_safe(n: int, k=12) -> list[str]:
+    return ["".join(rnd.choices(string.ascii_letters + " ", k=k)) for _ in range(n)]
+
+
+def escape_heavy(n: int, k=12) -> list[str]:
+    return ["".join(rnd.choices(string.ascii_letters + "<>&\"'", k=k)) for _ in range(n)]
+
+
+class Money:
+    def __init__(self, cents: int):
+        self.cents = cents
+
+    def __html__(self):
+        return f"<span class=money>{ self.cents // 100 }.{ self.cents % 100:02}</span>"
+
+
+SAFE = mostly_safe(50)
+HEAVY = escape_heavy(50)
+NUMBERS = [rnd.randint(0, 10**6) for _ in range(25)] + [rnd.random() * 1000 for _ in range(25)]
+DEEP = [[["a", ["<b>", 1, None]], [True, "c", [2.5, ("d", ["e"])]]] for _ in range(10)]
+HTML_OBJECTS = [Money(rnd.randint(0, 10**5)) for _ in range(50)]
+ROWS = [{"name": s, "qty": i} for i, s in zip(range(50), SAFE)]
+ATTRS = {
+    "id": "product-42",
+    "class": "card card--featured",
+    "title": 'Tom & Jerry "special"',
+    "data-price": 1999,
+    "data-ratio": 0.75,
+    "hidden": False,
+    "disabled": True,
+    "aria-label": None,
+}
+CLASSES = ("btn", "btn-primary", True and "active", False and "disabled", None, ["px-4", "py-2", None])
+CONFIG = {
+    "endpoint": "/api/v1/products",
+    "retries": 3,
+    "labels": {"ok": "Saved", "error": "Couldn't save <item>"},
+    "items": [{"id": i, "name": s} for i, s in zip(range(20), SAFE)],
+}
+JS = "document.querySelectorAll('.card').forEach((el) => el.addEventListener('click', () => go('</x>')));" * 5
+LONG_SAFE = " ".join(SAFE) * 4
+LONG_HEAVY = " ".join(HEAVY) * 4
+
+ROW_TEMPLATE = string.Template("<tr><td>$name</td><td>$qty</td></tr>")
+
+CASES: dict[str, Callable[[], Any]] = {
+    "text.mostly_safe": lambda: ht.text(SAFE),
+    "text.escape_heavy": lambda: ht.text(HEAVY),
+    "text.numbers": lambda: ht.text(NUMBERS),
+    "text.deep_iterables": lambda: ht.text(DEEP),
+    "text.html_objects": lambda: ht.text(HTML_OBJECTS),
+    "text.sep": lambda: ht.text(SAFE, sep=", "),
+    "text.rows": lambda: ht.text(
+        ht.markup(f"<tr><td>{ ht.text(r['name']) }</td><td>{ ht.text(r['qty']) }</td></tr>") for r in ROWS
+    ),
+    "attr.mixed": lambda: ht.attr(ATTRS),
+    "attr.kwargs": lambda: ht.attr(id="x", title="<y>", hidden=True, tabindex=1),
+    "classname.mixed": lambda: ht.classname(*CLASSES),
+    "classname.strings": lambda: ht.classname(*SAFE[:8]),
+    "escape.short_safe": lambda: [ht.escape(s) for s in SAFE],
+    "escape.short_heavy": lambda: [ht.escape(s) for s in HEAVY],
+    "escape.long_safe": lambda: ht.escape(LONG_SAFE),
+    "escape.long_heavy": lambda: ht.escape(LONG_HEAVY),
+    "json_attr.config": lambda: ht.json_attr(CONFIG),
+    "script.inline": lambda: ht.script(JS),
+    "ref.html_escape.short_safe": lambda: [html.escape(s) for s in SAFE],
+    "ref.html_escape.short_heavy": lambda: [html.escape(s) for s in HEAVY],
+    "ref.html_escape.long_heavy": lambda: html.escape(LONG_HEAVY),
+    "ref.template.rows": lambda: "".join(
+        ROW_TEMPLATE.substitute(name=html.escape(r["name"]), qty=r["qty"]) for r in ROWS
+    ),
+}
+
+
+def measure(func: Callable[[], Any], repeat: int) -> dict[str, float]:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    runs = sorted(t / number * 1e9 for t in timer.repeat(repeat=repeat, number=number))
+    quartiles = statistics.quantiles(runs, n=4) if len(runs) > 1 else [runs[0]] * 3
+    return {"ns": runs[0], "median": quartiles[1], "iqr": quartiles[2] - quartiles[0]}
+
+
+def run(pattern: str | None, repeat: int) -> dict[str, dict[str, float]]:
+    results = {}
+    for name, func in CASES.items():
+        if pattern and pattern not in name:
+            continue
+        results[name] = res = measure(func, repeat)
+        print(f"{name:<32} {res['ns']:>12.0f} ns  ±{res['iqr']:>8.0f}", file=sys.stderr)
+    return results
+
+
+def compare(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]], threshold: float) -> bool:
+    """Prints the comparison table, returns whether anything regressed"""
+    regressed = False
+    print(f"\n{'case':<32} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<32} {'-':>12} {cur['ns']:>12.0f}")
+            continue
+        change = cur["ns"] / base["ns"] - 1
+        noise = cur["iqr"] + base["iqr"]
+        mark = ""
+        if change > threshold and cur["ns"] - base["ns"] > noise:
+            mark = "  REGRESSION"
+            regressed = regressed or not name.startswith("ref.")
+        elif change < -threshold and base["ns"] - cur["ns"] > noise:
+            mark = "  improved"
+        print(f"{name:<32} {base['ns']:>12.0f} {cur['ns']:>12.0f} {change:>+8.1%}{mark}")
+    return regressed
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="pattern", help="run only the cases containing the substring")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--save", metavar="PATH", help="store the results as the baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results against the baseline")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown treated as regression")
+    args = parser.parse_args(argv)
+
+    results = run(args.pattern, args.repeat)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            meta = {"python": platform.python_version(), "machine": platform.machine(), "htmf": ht.__version__}
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline["results"], args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
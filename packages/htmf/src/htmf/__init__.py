@@ -5,32 +5,87 @@
 __version__ = "0.3.0"
 
 
-from typing import Mapping, Iterable, Protocol, TypeGuard, TypeVar, Annotated, Any, cast
-
+from typing import (
+    Mapping,
+    Iterable,
+    Iterator,
+    Sequence,
+    AsyncIterable,
+    Awaitable,
+    Callable,
+    Hashable,
+    NamedTuple,
+    ParamSpec,
+    Protocol,
+    TypeGuard,
+    TypeVar,
+    Annotated,
+    Any,
+    Literal,
+    cast,
+    overload,
+)
+
+import os
 import re
 import json as _json
+from collections import OrderedDict
+from contextvars import Context, copy_context
+from functools import wraps
 from html import unescape
+from itertools import chain
+import sys
+from sys import getsizeof
+from threading import Lock, get_native_id, local as _thread_local
+import weakref
 
 
 __all__ = [
+    "FLUSH",
+    "AttrTemplate",
     "Attrs",
+    "CacheInfo",
+    "ClassList",
+    "Rope",
     "Safe",
     "SafeOf",
+    "Slot",
+    "atext",
     "attr",
     "c",
+    "cached_html",
     "classname",
+    "classname_cache_info",
+    "component",
     "csv_attr",
+    "disable_classname_cache",
+    "disable_escape_cache",
     "document",
+    "enable_classname_cache",
+    "enable_escape_cache",
+    "escape_cache_info",
+    "escape_many",
     "handler",
+    "invalidate_html",
+    "iter_text",
     "json_attr",
+    "json_attr_cache_clear",
+    "json_attr_cache_info",
     "m",
     "mark_as_safe",
     "markup",
+    "parallel",
+    "register",
+    "rope",
     "script",
+    "set_json_encoder",
+    "static",
     "style",
     "stylesheet",
     "t",
+    "table",
     "text",
+    "text_into",
 ]
 
 
@@ -43,35 +98,300 @@ Attrs = Mapping[str, Arg]
 CnArg = str | bool | None | ProvidesHtml
 
 S = TypeVar("S", bound="Safe")
+T = TypeVar("T")
 SafeOf = Annotated[S, "safe"]
 """Generic annotation to mark NewType(T, Safe) as safe for linter"""
 
 
 _INT_OR_FLOAT = (int, float)
-_REPLACE_RE = re.compile(r"""[&<>"']""")
 
+# The escapers of the contexts are the chained str.replace, each guarded by the `in` check: the fastest of the re.sub,
+# str.translate and str.replace variants, see benchmarks/bench_escape.py. The check is much cheaper than the
+# str.replace not finding anything. Strings not requiring escaping are returned as is avoiding extra mem allocation.
+def _html_escape(s: str) -> str:
+    if "&" in s:
+        s = s.replace("&", "&amp;")
+    if "<" in s:
+        s = s.replace("<", "&lt;")
+    if ">" in s:
+        s = s.replace(">", "&gt;")
+    if '"' in s:
+        s = s.replace('"', "&quot;")
+    if "'" in s:
+        s = s.replace("'", "&#39;")
+    return s
 
-def _replacer(m: re.Match[str]):
-    return {
-        "&": "&amp;",
-        "<": "&lt;",
-        ">": "&gt;",
-        '"': "&quot;",
-        "'": "&#39;",
-    }[m[0]]
 
+def _text_escape(s: str) -> str:
+    if "&" in s:
+        s = s.replace("&", "&amp;")
+    if "<" in s:
+        s = s.replace("<", "&lt;")
+    if ">" in s:
+        s = s.replace(">", "&gt;")
+    return s
 
-# The re.sub is very fast and won't call _replacer until strictly needed.
-# Moreover, most strings would not require escaping and re.sub will return the original string
-# avoiding extra mem allocation.
-def _html_escape(s: str) -> str:
-    return _REPLACE_RE.sub(_replacer, s)
+
+def _attr_value_escape(s: str) -> str:
+    if "&" in s:
+        s = s.replace("&", "&amp;")
+    if '"' in s:
+        s = s.replace('"', "&quot;")
+    return s
+
+
+# Characters ending the unquoted attribute name, or the tag, plus the ones escaped by the _html_escape.
+# The character references are not decoded in names, but keep the name whole.
+_ATTR_NAME_RE = re.compile(r"""[\s"'<>/=&\x00-\x1f\x7f]""")
+_ATTR_NAME_REFS = {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}
+
+
+def _attr_name_ref(m: re.Match[str]) -> str:
+    c = m[0]
+    return _ATTR_NAME_REFS.get(c) or f"&#{ ord(c) };"
+
+
+# Names are the few literals rendered over and over, cached with the whitespaces stripped
+_attr_names: dict[str, str] = {}
+_ATTR_NAMES_MAXSIZE = 1024
+
+
+def _attr_name_escape(s: str) -> str:
+    res = _attr_names.get(s)
+    if res is None:
+        res = _ATTR_NAME_RE.sub(_attr_name_ref, s.strip())
+        if len(_attr_names) >= _ATTR_NAMES_MAXSIZE:  # e.g. the names built on the fly
+            _attr_names.clear()
+        _attr_names[s] = res
+    return res
+
+
+EscapeContext = Literal["html", "text", "attr_value", "attr_name"]
+_ESCAPERS: dict[str, Callable[[str], str]] = {
+    "text": _text_escape,
+    "attr_value": _attr_value_escape,
+    "attr_name": _attr_name_escape,
+}
 
 
 def _provides_html(obj: object) -> TypeGuard[ProvidesHtml]:
     return hasattr(obj, "__html__")
 
 
+# Renderer of the object not being the str, number, bool or None. Returns None if the object is not rendered by itself,
+# i.e. is iterated or dropped.
+Renderer = Callable[[Any], "str | None"]
+
+
+def _call_html(obj: ProvidesHtml) -> str:
+    return obj.__html__()
+
+
+def _probe_html(obj: object) -> str | None:
+    return obj.__html__() if _provides_html(obj) else None
+
+
+def _plain_attrs(tp: type) -> bool:
+    # the instances have no attributes of their own, so the type tells whether they provide the __html__
+    return tp.__dictoffset__ == 0 and not any(
+        "__getattr__" in vars(base) or ("__getattribute__" in vars(base) and base.__module__ != "builtins")
+        for base in tp.__mro__
+    )
+
+
+def _make_registered(func: Callable[[Any], Any]) -> Renderer:
+    def render(obj: Any) -> str:
+        return text(func(obj))
+
+    return render
+
+
+_registry: dict[type, Callable[[Any], Any]] = {}
+_registry_version = 0  # bumped by the register, tells the concurrent _resolve its renderer may be stale
+
+# Renderers by the exact type of objects, resolved on the first sight. The None means the objects of the type
+# are never rendered by themselves, so they are iterated without probing for the __html__ every time.
+_dispatch: dict[type, Renderer | None] = {}
+_DISPATCH_MAXSIZE = 4096
+
+
+def _resolve(obj: object) -> str | None:
+    """Renderer of the yet unseen type. Resolves and caches the renderer, then renders the object"""
+    renderer = _renderer(type(obj))
+    return None if renderer is None else renderer(obj)
+
+
+def _renderer(tp: type) -> Renderer | None:
+    """Resolve and cache the renderer of the type"""
+    version = _registry_version
+    renderer: Renderer | None
+    for base in tp.__mro__:
+        func = _registry.get(base)
+        if func is not None:
+            renderer = _make_registered(func)
+            break
+    else:
+        if hasattr(tp, "__html__"):
+            renderer = _call_html
+        elif _plain_attrs(tp):
+            renderer = None
+        else:
+            renderer = _probe_html
+    if len(_dispatch) >= _DISPATCH_MAXSIZE:  # e.g. the classes created on the fly
+        _dispatch.clear()
+    _dispatch[tp] = renderer
+    if version != _registry_version:  # registered meanwhile, resolve again next time
+        _dispatch.pop(tp, None)
+    return renderer
+
+
+# Escaping functions used by the helpers, of the html and the double-quoted attribute values.
+# Swapped by the enable_escape_cache.
+_esc = _html_escape
+_attr_esc = _attr_value_escape
+
+
+class CacheInfo(NamedTuple):
+    """Statistics of the htmf caches. Sizes are in bytes as reported by `sys.getsizeof`"""
+
+    hits: int
+    misses: int
+    bypassed: int
+    currsize: int
+    maxsize: int | None
+    currbytes: int
+    maxbytes: int | None
+
+
+class _Owner:
+    """Dropped with the thread-local storage of the finished thread, the finalizer folds its counters"""
+
+    __slots__ = ("__weakref__",)
+
+
+# Statistics of the lock-free caches. Each thread counts into its own list, no lost updates of the parallel threads.
+# Counters of the finished threads are folded into the totals, so the pools of short-lived threads don't grow them.
+class _ThreadCounters:
+    def __init__(self, n: int):
+        self.local = _thread_local()
+        self.running: dict[int, list[int]] = {}  # id of the counters -> counters of the running thread
+        self.finished = [0] * n
+        self.lock = Lock()
+
+    def register(self) -> list[int]:
+        """Counters of the current thread, the hot path reads the `local.counts` and falls back to this"""
+        counts = self.local.counts = [0] * len(self.finished)
+        owner = self.local.owner = _Owner()
+        with self.lock:
+            self.running[id(counts)] = counts
+        weakref.finalize(owner, self._fold, counts)
+        return counts
+
+    def _fold(self, counts: list[int]):
+        with self.lock:
+            if self.running.pop(id(counts), None) is not None:
+                self.finished = [a + b for a, b in zip(self.finished, counts)]
+
+    def totals(self) -> list[int]:
+        with self.lock:
+            return [sum(c) for c in zip(self.finished, *self.running.values())]
+
+
+_HITS, _MISSES, _BYPASSED = range(3)
+
+
+def _make_cached_escape(maxsize: int, max_length: int):
+    # Both escapings of the string are cached together: the labels and usernames of the text
+    # are the attribute values too, e.g. the title of the link. The attr_cache keys follow the cache.
+    cache: dict[str, str] = {}
+    attr_cache: dict[str, str] = {}
+    get = cache.get
+    attr_get = attr_cache.get
+    esc = _html_escape  # not the current _esc, re-enabling would wrap the previous cache
+    attr_esc = _attr_value_escape
+    counters = _ThreadCounters(3)
+    local = counters.local
+    register = counters.register
+
+    def put(s: str, res: str, attr_res: str):
+        if len(cache) >= maxsize:
+            try:  # drop the oldest entry. may race with other threads, that's ok
+                oldest = next(iter(cache))
+                del cache[oldest]
+                attr_cache.pop(oldest, None)
+            except (KeyError, StopIteration, RuntimeError):
+                pass
+        attr_cache[s] = attr_res
+        cache[s] = res
+
+    def cached_escape(s: str) -> str:
+        try:
+            counts = local.counts
+        except AttributeError:
+            counts = register()
+        if len(s) > max_length:
+            counts[_BYPASSED] += 1
+            return esc(s)
+        res = get(s)
+        if res is None:
+            counts[_MISSES] += 1
+            res = esc(s)
+            put(s, res, attr_esc(s))
+        else:
+            counts[_HITS] += 1
+        return res
+
+    def cached_attr_escape(s: str) -> str:
+        try:
+            counts = local.counts
+        except AttributeError:
+            counts = register()
+        if len(s) > max_length:
+            counts[_BYPASSED] += 1
+            return attr_esc(s)
+        res = attr_get(s)
+        if res is None:
+            counts[_MISSES] += 1
+            res = attr_esc(s)
+            put(s, esc(s), res)
+        else:
+            counts[_HITS] += 1
+        return res
+
+    def info() -> CacheInfo:
+        hits, misses, bypassed = counters.totals()
+        currbytes = sum(getsizeof(v) for v in [*cache.values(), *attr_cache.values()])
+        return CacheInfo(hits, misses, bypassed, len(cache), maxsize, currbytes, None)
+
+    return cached_escape, cached_attr_escape, info
+
+
+_escape_cache_info: Callable[[], CacheInfo] | None = None
+
+
+def enable_escape_cache(maxsize=4096, max_length=64):
+    """
+    Enable the memo cache of escaped strings, used by the `text`, `attr` values, `classname`, `style`, `handler`.
+    Pays off if the same dynamic strings (labels, usernames, enum values) are rendered over and over.
+
+    Up to `maxsize` strings not longer than `max_length` are cached, the longer ones bypass the cache.
+    Enabling the cache again resets it.
+    """
+    global _esc, _attr_esc, _escape_cache_info
+    _esc, _attr_esc, _escape_cache_info = _make_cached_escape(maxsize, max_length)
+
+
+def disable_escape_cache():
+    """Disable the escape cache and drop its content"""
+    global _esc, _attr_esc, _escape_cache_info
+    _esc, _attr_esc, _escape_cache_info = _html_escape, _attr_value_escape, None
+
+
+def escape_cache_info() -> CacheInfo | None:
+    """Return the escape cache statistics or `None` if the cache is disabled"""
+    return _escape_cache_info() if _escape_cache_info else None
+
+
 class Safe(str):
     """
     Noop class for marking the string as HTML-safe.
@@ -81,10 +401,43 @@ class Safe(str):
     Not intended to be instantiated outside of the library code !
     """
 
+    # no __dict__ and __weakref__, so instances are as small as str and not tracked by GC
+    __slots__ = ()
+
+    def __reduce__(self):
+        # pickled as is, stays safe after unpickling (e.g. from the process pool)
+        return (_restore_safe, (type(self), str(self)))
+
     def unescape(self) -> str:
         return unescape(self)
 
 
+# Shared empty result
+_EMPTY = Safe()
+
+
+def _restore_safe(cls: type[S], s: str) -> S:
+    # bypasses the __new__ of subclasses, e.g. the ClassList would escape again
+    return str.__new__(cls, s)
+
+
+def register(tp: type[T], renderer: Callable[[T], "Arg | Iterable[Arg]"] | None):
+    """
+    Render the objects of the type (and its subclasses) in the `text`, `attr` and `classname` by the `renderer`.
+    Result of the renderer is rendered as the `text` argument, e.g. strings are escaped.
+    The `None` unregisters the type.
+
+    Has no effect for the `str`, numbers, `bool` and their subclasses, they are rendered first.
+    """
+    global _registry_version
+    if renderer is None:
+        _registry.pop(tp, None)
+    else:
+        _registry[tp] = renderer
+    _registry_version += 1
+    _dispatch.clear()
+
+
 def mark_as_safe(s: str) -> Safe:
     """
     Mark the string as safe, promoting it to the Safe class.
@@ -93,9 +446,63 @@ def mark_as_safe(s: str) -> Safe:
     return Safe(s)
 
 
-def escape(s: str) -> Safe:
-    """HTML-escape the string making it safe for inclusion in the markup"""
-    return s if isinstance(s, Safe) else Safe(_html_escape(s))
+def escape(s: str, context: EscapeContext = "html") -> Safe:
+    """
+    HTML-escape the string making it safe for inclusion in the markup.
+
+    The `context` narrows the escaping down to the place of the string:
+    - `html` anywhere in the text and the attribute values quoted either way, escapes `& < > " '`
+    - `text` the text content only, escapes `& < >`
+    - `attr_value` the double-quoted attribute value only, escapes `& "`
+    - `attr_name` the attribute name, strips it and escapes the whitespaces, quotes, `< > / = &`
+    """
+    if isinstance(s, Safe):
+        return s
+    if context == "html":
+        return Safe(_esc(s))
+    esc = _ESCAPERS.get(context)
+    if esc is None:
+        raise ValueError(f"Unknown escape context { context !r}")
+    return Safe(esc(s))
+
+
+# Below this count the batch escaping loses to the plain per-item one, see benchmarks/bench_escape_many.py
+_ESCAPE_MANY_MIN = 8
+_ESCAPE_MANY_SEP = "\x00"
+
+
+def _escape_joined(strings: list[str]) -> list[Safe]:
+    sep = _ESCAPE_MANY_SEP
+    joined = sep.join(strings)
+    if joined.count(sep) != len(strings) - 1:  # separator is in some string
+        return [Safe(_html_escape(s)) for s in strings]
+    return list(map(Safe, _html_escape(joined).split(sep)))
+
+
+def escape_many(strings: Iterable[str]) -> list[Safe]:
+    """
+    Batch version of the `escape`. Returns the list of escaped strings, same as escaping them one by one.
+
+    Strings are escaped in the single pass, repeated strings are escaped just once.
+    """
+    items = list(strings)
+    safe = Safe
+
+    if len(items) < _ESCAPE_MANY_MIN:
+        return [s if isinstance(s, safe) else safe(_html_escape(s)) for s in items]
+
+    plain = [s for s in items if not isinstance(s, safe)]
+    if len(plain) != len(items):
+        escaped = iter(escape_many(plain))
+        return [s if isinstance(s, safe) else next(escaped) for s in items]
+
+    uniq = dict.fromkeys(items)
+    if len(uniq) * 2 <= len(items):
+        keys = list(uniq)
+        uniq.update(zip(keys, _escape_joined(keys)))
+        return list(map(uniq.__getitem__, items))
+
+    return _escape_joined(items)
 
 
 def markup(s: str) -> Safe:
@@ -121,14 +528,18 @@ def text(*args: Arg | Iterable[Arg], sep="") -> Safe:
     Returns the single string of values joined.
     """
 
+    if len(args) == 1 and type(args[0]) is Safe:  # nothing to join
+        return args[0]
+
     # unrolled and inlined to squieeze the marginal extra performance
 
     toks: list[str] = []
 
     append = toks.append
-    esc = _html_escape
+    esc = _esc
     isinst = isinstance
-    has_html = _provides_html
+    dget = _dispatch.get
+    resolve = _resolve
     safe = Safe
     number = _INT_OR_FLOAT
     _str = str
@@ -142,11 +553,11 @@ def text(*args: Arg | Iterable[Arg], sep="") -> Safe:
             append(esc(arg))
         elif isinst(arg, number):  # rendered numbers should contain no html-unsafe chars
             append(_str(arg))
-        elif has_html(arg):
-            append(arg.__html__())
+        elif (render := dget(type(arg), resolve)) is not None and (tok := render(arg)) is not None:
+            append(tok)
         else:  # must be iterable
             try:
-                for sub in cast(Iterable[Arg], arg):
+                for sub in cast("Iterable[Arg]", arg):
                     if sub is True or sub is False or sub is None:
                         pass
                     elif isinst(sub, safe):
@@ -155,12 +566,539 @@ def text(*args: Arg | Iterable[Arg], sep="") -> Safe:
                         append(esc(sub))
                     elif isinst(sub, number):
                         append(_str(sub))
-                    elif has_html(sub):
-                        append(sub.__html__())
+                    elif (render := dget(type(sub), resolve)) is not None and (tok := render(sub)) is not None:
+                        append(tok)
+            except TypeError:
+                pass
+
+    if len(toks) == 1:  # avoid the copy by join and the second wrapper
+        tok = toks[0]
+        return tok if type(tok) is safe else safe(tok)
+    return safe(sep.join(toks)) if toks else _EMPTY
+
+
+class _Flush:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "FLUSH"
+
+
+FLUSH = _Flush()
+"""Marker forcing the `iter_text` to emit the buffered chunk. Dropped by everything else."""
+
+
+# Flattens the arguments exactly as the `text` does, yielding the escaped tokens one by one.
+# FLUSH markers and ropes are passed through as is.
+def _iter_toks(args: Iterable[Arg | Iterable[Arg]]) -> Iterator["str | _Flush | Rope"]:
+    esc = _esc
+    isinst = isinstance
+    dget = _dispatch.get
+    resolve = _resolve
+    safe = Safe
+    number = _INT_OR_FLOAT
+    _str = str
+    flush = FLUSH
+    rope = Rope
+
+    for arg in args:
+        if arg is True or arg is False or arg is None:
+            pass
+        elif isinst(arg, safe):
+            yield arg
+        elif isinst(arg, _str):
+            yield esc(arg)
+        elif isinst(arg, number):
+            yield _str(arg)
+        elif arg is flush or isinst(arg, rope):
+            yield arg
+        elif (render := dget(type(arg), resolve)) is not None and (tok := render(arg)) is not None:
+            yield tok
+        else:  # must be iterable
+            try:
+                for sub in cast("Iterable[Arg]", arg):
+                    if sub is True or sub is False or sub is None:
+                        pass
+                    elif isinst(sub, safe):
+                        yield sub
+                    elif isinst(sub, _str):
+                        yield esc(sub)
+                    elif isinst(sub, number):
+                        yield _str(sub)
+                    elif sub is flush or isinst(sub, rope):
+                        yield sub
+                    elif (render := dget(type(sub), resolve)) is not None and (tok := render(sub)) is not None:
+                        yield tok
             except TypeError:
                 pass
 
-    return safe(sep.join(toks))
+
+# Flattened pieces of the result: tokens, separators and leaves of the ropes. FLUSH markers are passed through.
+def _iter_pieces(args: Iterable[Arg | Iterable[Arg]], sep: str) -> Iterator[str | _Flush]:
+    return _walk_toks(_iter_toks(args), sep)
+
+
+def _walk_toks(toks: "Iterator[str | _Flush | Rope]", sep: str) -> Iterator[str | _Flush]:
+    flush = FLUSH
+    isinst = isinstance
+    rope = Rope
+    started = False
+
+    for tok in toks:
+        if tok is flush:
+            yield flush
+            continue
+        if sep and started:
+            yield sep
+        started = True
+        if isinst(tok, rope):  # the rope is the single token
+            leaves = tok.leaves()  # type: ignore[union-attr]
+            for leaf in leaves:
+                if isinst(leaf, rope):  # the unfilled slot
+                    # render on until it's filled, e.g. by the generator of the body, holding the rest of the rope
+                    slot = cast("Slot", leaf)
+                    held: list[str | _Flush | Rope] = [Rope([slot, *leaves])]
+                    for nxt in toks:
+                        held.append(nxt)
+                        if slot.filled:
+                            break
+                    else:
+                        if not slot.filled:
+                            raise ValueError(f"{ slot !r} is not filled")
+                    yield from _walk_toks(chain(held, toks), sep)
+                    return
+                yield leaf  # type: ignore[misc]
+        else:
+            yield tok
+
+
+def _iter_chunks(args: Iterable[Arg | Iterable[Arg]], sep: str, chunk_size: int) -> Iterator[Safe]:
+    buf: list[str] = []
+    append = buf.append
+    join = "".join
+    safe = Safe
+    flush = FLUSH
+    size = 0
+
+    for piece in _iter_pieces(args, sep):
+        if piece is flush:
+            if buf:
+                yield safe(join(buf))
+                buf.clear()
+                size = 0
+            continue
+        append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield safe(join(buf))
+            buf.clear()
+            size = 0
+
+    if buf:
+        yield safe(join(buf))
+
+
+# Encoded forms of the static fragments, see `static`. Keyed by the identity, entry keeps the fragment alive
+_static: dict[int, tuple[Safe, dict[str, bytes]]] = {}
+# Smaller fragments are encoded along with the neighbour pieces
+_STATIC_MIN_LENGTH = 256
+
+
+def static(s: Safe) -> Safe:
+    """
+    Mark the fragment as static, e.g. the module-level constant of the page layout rendered on every request.
+    The `iter_text` and `text_into` with the `encoding` encode it once and reuse the bytes.
+
+    Static fragments are kept alive for the lifetime of the process, don't mark the per-request content.
+    Fragments shorter than 256 characters are returned as is, they are cheaper to encode along with the rest.
+    """
+    if not isinstance(s, Safe):
+        raise TypeError(f"Expected the Safe fragment, got { type(s).__name__ }")
+    if len(s) >= _STATIC_MIN_LENGTH:
+        _static.setdefault(id(s), (s, {}))
+    return s
+
+
+def _iter_encoded(args: Iterable[Arg | Iterable[Arg]], sep: str, chunk_size: int, encoding: str) -> Iterator[bytes]:
+    out: list[bytes] = []
+    run: list[str] = []  # consecutive pieces are encoded at once
+    append = run.append
+    join = "".join
+    flush = FLUSH
+    get = _static.get
+    min_length = _STATIC_MIN_LENGTH
+    size = 0
+
+    for piece in _iter_pieces(args, sep):
+        if piece is flush:
+            if run:
+                out.append(join(run).encode(encoding))
+                run.clear()
+            if out:
+                yield b"".join(out)
+                out.clear()
+                size = 0
+            continue
+        if len(piece) >= min_length and (entry := get(id(piece))) is not None and entry[0] is piece:
+            encoded = entry[1].get(encoding)
+            if encoded is None:
+                encoded = entry[1][encoding] = piece.encode(encoding)
+            if run:
+                out.append(join(run).encode(encoding))
+                run.clear()
+            out.append(encoded)
+        else:
+            append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            if run:
+                out.append(join(run).encode(encoding))
+                run.clear()
+            yield b"".join(out)
+            out.clear()
+            size = 0
+
+    if run:
+        out.append(join(run).encode(encoding))
+    if out:
+        yield b"".join(out)
+
+
+@overload
+def iter_text(
+    *args: Arg | Iterable[Arg], sep: str = "", chunk_size: int = 16384, encoding: None = None
+) -> Iterator[Safe]: ...
+@overload
+def iter_text(*args: Arg | Iterable[Arg], sep: str = "", chunk_size: int = 16384, encoding: str) -> Iterator[bytes]: ...
+def iter_text(
+    *args: Arg | Iterable[Arg], sep="", chunk_size=16384, encoding: str | None = None
+) -> Iterator[Safe] | Iterator[bytes]:
+    """
+    Streaming variant of the `text`.
+
+    Accepts the same arguments and follows the same rules, but yields the result in chunks
+    instead of building the one single string. Iterables (generators too) are consumed lazily,
+    so the first chunk is ready before the rest of the page is rendered.
+
+    Tokens are buffered until `chunk_size` characters are collected. Tokens are never split,
+    so the chunk may be larger if some single token is. `FLUSH` marker emits the buffered chunk
+    right away, e.g. to send the `<head>` while the body is still being built.
+
+    Joined chunks are equal to the `text` result.
+
+    If the `encoding` is set, chunks are encoded to `bytes`. Fragments marked by the `static` are encoded once
+    and reused.
+    """
+    if encoding is None:
+        return _iter_chunks(args, sep, chunk_size)
+    return _iter_encoded(args, sep, chunk_size, encoding)
+
+
+_T_contra = TypeVar("_T_contra", contravariant=True)
+
+
+class SupportsWrite(Protocol[_T_contra]):
+    def write(self, s: _T_contra, /) -> object: ...
+
+
+@overload
+def text_into(
+    writer: SupportsWrite[str],
+    /,
+    *args: Arg | Iterable[Arg],
+    sep: str = "",
+    chunk_size: int = 16384,
+    encoding: None = None,
+) -> int: ...
+@overload
+def text_into(
+    writer: SupportsWrite[bytes], /, *args: Arg | Iterable[Arg], sep: str = "", chunk_size: int = 16384, encoding: str
+) -> int: ...
+def text_into(
+    writer: SupportsWrite[Any], /, *args: Arg | Iterable[Arg], sep="", chunk_size=16384, encoding: str | None = None
+) -> int:
+    """
+    Render the arguments straight into the writer, e.g. file, `io.StringIO` or socket wrapper.
+
+    Follows the `iter_text` rules: small tokens are batched into the chunks of about `chunk_size` characters,
+    each chunk is written by the single `write` call. No intermediate string of the whole result is built.
+    If the `encoding` is set, `bytes` are written, e.g. for the binary files and sockets.
+
+    Returns the number of characters (bytes if encoded) written.
+    """
+    write = writer.write
+    total = 0
+    for chunk in iter_text(*args, sep=sep, chunk_size=chunk_size, encoding=encoding):
+        write(chunk)
+        total += len(chunk)
+    return total
+
+
+class Rope:
+    """
+    Lazy concatenation of the HTML-safe tokens.
+
+    Holds the escaped tokens and the nested ropes by reference instead of copying them into the new string.
+    The whole tree is flattened once at the top: by the `iter_text` into the stream,
+    by the `flatten` into the `Safe` string.
+
+    Rope is not the `str`. It's accepted by all htmf utilities as the object with `__html__`
+    and may be interpolated into f-strings, but both of these flatten it.
+    """
+
+    __slots__ = ("toks",)
+
+    def __init__(self, toks: "list[str | _Flush | Rope]"):
+        self.toks = toks
+
+    def leaves(self) -> "Iterator[str | _Flush | Slot]":
+        """Yield the flattened tokens, depth-first. Unfilled slots are yielded as is"""
+        isinst = isinstance
+        rope = Rope
+        stack = [iter(self.toks)]
+        while stack:
+            for tok in stack[-1]:
+                if isinst(tok, rope) and tok.toks is not None:  # type: ignore[union-attr]
+                    stack.append(iter(tok.toks))
+                    break
+                yield tok
+            else:
+                stack.pop()
+
+    def flatten(self) -> Safe:
+        """Raises ValueError if some slot is not filled"""
+        flush = FLUSH
+        try:
+            return Safe("".join([tok for tok in self.leaves() if tok is not flush]))  # type: ignore[misc]
+        except TypeError:
+            slot = next(tok for tok in self.leaves() if isinstance(tok, Slot))
+            raise ValueError(f"{ slot !r} is not filled") from None
+
+    def __html__(self) -> str:
+        return self.flatten()
+
+    def __str__(self) -> str:
+        return self.flatten()
+
+    def __format__(self, format_spec: str) -> str:
+        return format(self.flatten(), format_spec)
+
+    def __repr__(self):
+        return f"Rope({ self.toks !r})"
+
+
+class Slot(Rope):
+    """
+    Placeholder of the fragment known only after the rest of the page is rendered,
+    e.g. the collected assets, the page title, counts.
+
+    Held by reference as the nested `Rope`: put the slot into the `rope` or the `iter_text` arguments,
+    render the body, then `fill` the slot. It's read when the result is flattened or streamed,
+    so the final assembly is the single join, no search-and-replace over the page.
+    The `iter_text` holds the chunks behind the unfilled slot until the rest of the arguments fill it,
+    and streams the slot as soon as it's filled.
+
+    Reading the unfilled slot, e.g. by the `text` or f-string interpolation, raises ValueError.
+    """
+
+    __slots__ = ("name",)
+
+    def __init__(self, name=""):
+        self.name = name
+        self.toks = None  # type: ignore[assignment]
+
+    @property
+    def filled(self) -> bool:
+        return self.toks is not None
+
+    def fill(self, *args: Arg | Iterable[Arg], sep="") -> "Slot":
+        """Render the arguments by the `rope` rules into the slot. Filling again replaces the content"""
+        self.toks = rope(*args, sep=sep).toks
+        return self
+
+    def leaves(self) -> "Iterator[str | _Flush | Slot]":
+        return iter((self,)) if self.toks is None else super().leaves()
+
+    def __repr__(self):
+        if self.toks is None:
+            return f"Slot({ self.name !r})"
+        return f"Slot({ self.name !r}, { self.toks !r})"
+
+
+def rope(*args: Arg | Iterable[Arg], sep="") -> Rope:
+    """
+    Lazy variant of the `text`.
+
+    Accepts the same arguments and follows the same rules, but returns the `Rope` holding the escaped tokens
+    instead of joining them. Nested ropes are held by reference. Flattened result is equal to the `text` result.
+    """
+    toks = list(_iter_toks(args))
+    if sep:
+        flush = FLUSH
+        joined: list[str | _Flush | Rope] = []
+        append = joined.append
+        started = False
+        for tok in toks:
+            if tok is not flush:
+                if started:
+                    append(sep)
+                started = True
+            append(tok)
+        toks = joined
+    return Rope(toks)
+
+
+AsyncArg = Arg | Awaitable[Arg | Iterable[Arg]]
+
+
+def _is_plain(obj: object) -> bool:
+    # values consumed by the `text` as is, i.e. not iterated. Same dispatch as of the `text`, the registered types too
+    if obj is True or obj is False or obj is None or isinstance(obj, (str, int, float)) or obj is FLUSH:
+        return True
+    tp = type(obj)
+    renderer = _dispatch.get(tp, _MISSING)
+    if renderer is _MISSING:
+        renderer = _renderer(tp)
+    return renderer is not None and (renderer is not _probe_html or _provides_html(obj))
+
+
+def _is_async(obj: object) -> bool:
+    return hasattr(obj, "__await__") or hasattr(obj, "__aiter__")
+
+
+async def _resolve_arg(arg: Any) -> Any:
+    # the argument: awaited until not awaitable, iterables are resolved item by item
+    while hasattr(arg, "__await__"):
+        arg = await arg
+    if hasattr(arg, "__aiter__"):
+        return await _collect_async(arg)
+    if _is_plain(arg):
+        return arg
+    items = []
+    try:
+        for sub in arg:
+            items.append(sub)
+    except TypeError:  # same as for the sync iterables in the `text`
+        pass
+    return await _resolve_items(items)
+
+
+async def _resolve_item(item: Any) -> tuple[bool, Any]:
+    # the item of the iterable: awaited until not awaitable, async iterables are spliced in
+    while hasattr(item, "__await__"):
+        item = await item
+    if hasattr(item, "__aiter__"):
+        return True, await _collect_async(item)
+    return False, item
+
+
+async def _resolve_items(items: list[Any]) -> list[Any]:
+    import asyncio
+
+    idxs = [i for i, item in enumerate(items) if _is_async(item)]
+    if not idxs:
+        return items
+    resolved = dict(zip(idxs, await asyncio.gather(*(_resolve_item(items[i]) for i in idxs))))
+    res = []
+    for i, item in enumerate(items):
+        spliced, item = resolved.get(i, (False, item))
+        if spliced:
+            res.extend(item)
+        else:
+            res.append(item)
+    return res
+
+
+async def _collect_async(arg: AsyncIterable[Any]) -> list[Any]:
+    try:
+        it = arg.__aiter__()
+    except TypeError:  # same as for the sync iterables in the `text`
+        return []
+    items = []
+    async for sub in it:  # type: ignore[attr-defined]
+        items.append(sub)
+    return await _resolve_items(items)
+
+
+async def atext(*args: AsyncArg | Iterable[AsyncArg] | AsyncIterable[AsyncArg], sep="") -> Safe:
+    """
+    Async variant of the `text`.
+
+    Accepts everything the `text` does, plus awaitables and async iterables in place of the values,
+    both at the top level and inside the iterables. All awaitables and async iterables are resolved
+    concurrently, then the results are escaped and joined by the `text` rules.
+    Resolution is recursive: awaited results may be awaitables, async iterables or iterables of such values too.
+    Async iterables inside the iterables are replaced by their items.
+    """
+    import asyncio  # imported lazily to keep the import time of the sync-only users low
+
+    vals: list[Any] = list(args)
+    pending: list[Awaitable[Any]] = []
+    idxs: list[int] = []
+
+    for i, arg in enumerate(args):
+        if _is_async(arg):
+            idxs.append(i)
+            pending.append(_resolve_arg(arg))
+        elif not _is_plain(arg):
+            items = []
+            try:
+                for sub in cast("Iterable[Any]", arg):
+                    items.append(sub)
+            except TypeError:
+                pass
+            vals[i] = items
+            if any(_is_async(sub) for sub in items):
+                idxs.append(i)
+                pending.append(_resolve_items(items))
+
+    if pending:
+        for i, res in zip(idxs, await asyncio.gather(*pending)):
+            vals[i] = res
+
+    return text(*vals, sep=sep)
+
+
+def _render_section(section: Callable[[], Arg | Iterable[Arg]]) -> Safe:
+    return text(section())
+
+
+def _render_in_context(ctx: Context, section: Callable[[], Arg | Iterable[Arg]]) -> Safe:
+    return ctx.run(_render_section, section)
+
+
+def parallel(
+    sections: Iterable[Callable[[], Arg | Iterable[Arg]]], executor: Any = None, chunksize: int | None = None
+) -> list[Safe]:
+    """
+    Render the independent sections in the `concurrent.futures` executor. Sections are zero-arg callables,
+    the results are `text`-ed and returned in order, ready to be fed into the `text`.
+
+    Thread pool pays off for the sections releasing GIL (or for free-threaded Python), process pool for the rest.
+    Sections for the process pool should be picklable, e.g. module-level functions or `functools.partial`s of them.
+    If `executor` is None, the temporary thread pool is used.
+
+    Process pool sends the sections in chunks of `chunksize` to amortize the IPC.
+    If None, sections are split into about 4 chunks per worker.
+
+    In the thread pool the sections see the context variables of the caller, e.g. the `htmf.assets` collector.
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    sections = list(sections)
+    if not sections:
+        return []
+    if executor is None:
+        with ThreadPoolExecutor(min(len(sections), os.cpu_count() or 1)) as pool:
+            return list(pool.map(_render_in_context, [copy_context() for _ in sections], sections))
+    if isinstance(executor, ThreadPoolExecutor):
+        return list(executor.map(_render_in_context, [copy_context() for _ in sections], sections))
+    if chunksize is None:
+        chunksize = 1
+        if isinstance(executor, ProcessPoolExecutor):
+            workers = getattr(executor, "_max_workers", None) or os.cpu_count() or 1
+            chunksize = max(1, -(-len(sections) // (workers * 4)))
+    return list(executor.map(_render_section, sections, chunksize=chunksize))
 
 
 def attr(arg: Attrs | None = None, /, **kwargs: Arg) -> Safe:
@@ -180,14 +1118,21 @@ def attr(arg: Attrs | None = None, /, **kwargs: Arg) -> Safe:
     Return the single string of whitespace-separated pairs.
     """
 
-    args = dict(arg or {}, **kwargs)
+    if kwargs:
+        args = dict(arg or {}, **kwargs)
+    elif arg:
+        args = arg
+    else:
+        return _EMPTY
 
     keyvals: list[str] = []
 
     append = keyvals.append
-    esc = _html_escape
+    esc = _attr_esc  # the values are double-quoted
+    name_esc = _attr_name_escape
     isinst = isinstance
-    has_html = _provides_html
+    dget = _dispatch.get
+    resolve = _resolve
     safe = Safe
     number = _INT_OR_FLOAT
 
@@ -195,9 +1140,7 @@ def attr(arg: Attrs | None = None, /, **kwargs: Arg) -> Safe:
         if v is None or v is False:
             pass
         else:
-            if not isinst(k, safe):
-                k = esc(k)
-            k = k.strip()
+            k = k.strip() if isinst(k, safe) else name_esc(k)
 
             if not k:  # special catch for the empty key
                 pass
@@ -209,12 +1152,82 @@ def attr(arg: Attrs | None = None, /, **kwargs: Arg) -> Safe:
                 append(f'{ k }="{ esc(v) }"')
             elif isinst(v, number):
                 append(f'{ k }="{ v }"')
-            elif has_html(v):
-                append(f'{ k }="{ v.__html__() }"')
+            elif (render := dget(type(v), resolve)) is not None and (tok := render(v)) is not None:
+                append(f'{ k }="{ tok }"')
 
     return safe(" ".join(keyvals))
 
 
+_MISSING: Any = object()
+
+
+class AttrTemplate:
+    """
+    Precompiled `attr` for the fixed set of keys.
+
+    Built once from the static name-value pairs and the names of dynamic keys.
+    Keys are sorted, escaped and stripped and static pairs are rendered right away,
+    so the call renders just the supplied dynamic values.
+
+    Called with the same arguments as the `attr`, returns the same result as the `attr` called with
+    the static pairs merged with the arguments. Arguments may override the static pairs too.
+    Unknown keys are supported as well, but fall back to the plain `attr`.
+    """
+
+    __slots__ = ("_keys", "_plan", "_rendered", "_static")
+
+    def __init__(self, static: Attrs | None = None, /, *dynamic: str):
+        self._static = dict(static or {})
+        self._keys = frozenset(self._static).union(dynamic)
+
+        plan: list[tuple[str, str, str | None]] = []
+        for key in sorted(self._keys):
+            k = key.strip() if isinstance(key, Safe) else _attr_name_escape(key)
+            piece = attr({key: self._static[key]}) if key in self._static else None
+            plan.append((key, k, piece or None))
+        self._plan = tuple(plan)
+        self._rendered = attr(self._static)
+
+    def __call__(self, arg: Attrs | None = None, /, **kwargs: Arg) -> Safe:
+        vals = kwargs if arg is None else dict(arg, **kwargs)
+        if not vals:
+            return self._rendered
+        if not vals.keys() <= self._keys:
+            return attr(dict(self._static, **vals))
+
+        keyvals: list[str] = []
+
+        append = keyvals.append
+        get = vals.get
+        esc = _attr_esc
+        isinst = isinstance
+        dget = _dispatch.get
+        resolve = _resolve
+        safe = Safe
+        number = _INT_OR_FLOAT
+        missing = _MISSING
+
+        for key, k, piece in self._plan:
+            v = get(key, missing)
+            if v is missing:
+                if piece:
+                    append(piece)
+            elif v is None or v is False or not k:
+                pass
+            elif v is True:
+                append(k)
+            elif isinst(v, safe):
+                append(f'{ k }="{ v }"')
+            elif isinst(v, str):
+                append(f'{ k }="{ esc(v) }"')
+            elif isinst(v, number):
+                append(f'{ k }="{ v }"')
+            elif (render := dget(type(v), resolve)) is not None and (tok := render(v)) is not None:
+                append(f'{ k }="{ tok }"')
+
+        return safe(" ".join(keyvals))
+
+
 def classname(*args: (CnArg | Iterable[CnArg]), sep=" ") -> Safe:
     """
     Another take on a classic `classnames`.
@@ -226,11 +1239,17 @@ def classname(*args: (CnArg | Iterable[CnArg]), sep=" ") -> Safe:
     Objects with __html__ method are also supported in place of strings.
 
     """
+    if len(args) == 1 and type(arg := args[0]) is Safe and arg and not arg[0].isspace() and not arg[-1].isspace():
+        return arg  # nothing to strip and join
+    if _cached_classname:
+        return _cached_classname(args, sep)
+
     toks: list[str] = []
     append = toks.append
-    esc = _html_escape
+    esc = _esc
     isinst = isinstance
-    has_html = _provides_html
+    dget = _dispatch.get
+    resolve = _resolve
     safe = Safe
     _str = str
 
@@ -241,23 +1260,146 @@ def classname(*args: (CnArg | Iterable[CnArg]), sep=" ") -> Safe:
             append(arg)
         elif isinst(arg, _str):
             append(esc(arg))
-        elif has_html(arg):
-            append(arg.__html__())
+        elif (render := dget(type(arg), resolve)) is not None and (tok := render(arg)) is not None:
+            append(tok)
         else:  # must be iterable
             try:
-                for sub in cast(Iterable[CnArg], arg):
+                for sub in cast("Iterable[CnArg]", arg):
                     if isinst(sub, safe):
                         append(sub)
                     elif isinst(sub, _str):
                         append(esc(sub))
-                    elif has_html(sub):
-                        append(sub.__html__())
+                    elif (render := dget(type(sub), resolve)) is not None and (tok := render(sub)) is not None:
+                        append(tok)
             except TypeError:
                 pass
 
     return safe(sep.join([name for tok in toks if (name := tok.strip())]))
 
 
+def _make_cached_classname(maxsize: int):
+    cache: dict[tuple[Any, ...], Safe] = {}
+    get = cache.get
+    counters = _ThreadCounters(2)
+    local = counters.local
+    register = counters.register
+
+    def cached_classname(args: tuple[CnArg | Iterable[CnArg], ...], sep: str) -> Safe:
+
+        # the key is the separator, raw tokens and the bitmask of safe tokens
+        toks: list[Any] = [sep]
+        append = toks.append
+        isinst = isinstance
+        dget = _dispatch.get
+        resolve = _resolve
+        safe = Safe
+        _str = str
+        mask = 0
+
+        for arg in args:
+            if arg is True or arg is False or arg is None:
+                pass
+            elif isinst(arg, safe):
+                mask |= 1 << len(toks)
+                append(arg)
+            elif isinst(arg, _str):
+                append(arg)
+            elif (render := dget(type(arg), resolve)) is not None and (tok := render(arg)) is not None:
+                mask |= 1 << len(toks)
+                append(tok)
+            else:
+                try:
+                    for sub in cast("Iterable[CnArg]", arg):
+                        if isinst(sub, safe):
+                            mask |= 1 << len(toks)
+                            append(sub)
+                        elif isinst(sub, _str):
+                            append(sub)
+                        elif (render := dget(type(sub), resolve)) is not None and (tok := render(sub)) is not None:
+                            mask |= 1 << len(toks)
+                            append(tok)
+                except TypeError:
+                    pass
+
+        append(mask)
+        key = tuple(toks)
+        try:
+            counts = local.counts
+        except AttributeError:
+            counts = register()
+        res = get(key)
+        if res is not None:
+            counts[_HITS] += 1
+            return res
+
+        counts[_MISSES] += 1
+        esc = _esc
+        names = [
+            name for i in range(1, len(toks) - 1) if (name := (toks[i] if mask >> i & 1 else esc(toks[i])).strip())
+        ]
+        res = safe(sep.join(names))
+        if len(cache) >= maxsize:
+            try:  # drop the oldest entry. may race with other threads, that's ok
+                del cache[next(iter(cache))]
+            except (KeyError, StopIteration, RuntimeError):
+                pass
+        cache[key] = res
+        return res
+
+    def info() -> CacheInfo:
+        hits, misses = counters.totals()
+        currbytes = sum(getsizeof(v) for v in list(cache.values()))
+        return CacheInfo(hits, misses, 0, len(cache), maxsize, currbytes, None)
+
+    return cached_classname, info
+
+
+_cached_classname: Callable[[tuple[CnArg | Iterable[CnArg], ...], str], Safe] | None = None
+_classname_cache_info: Callable[[], CacheInfo] | None = None
+
+
+def enable_classname_cache(maxsize=1024):
+    """
+    Enable the memo cache of the `classname` and `csv_attr` results, keyed by the resolved class tokens.
+    Repeated class lists, e.g. long static Tailwind strings with a few conditional classes,
+    cost the lookup instead of the escape, strip and join. Up to `maxsize` results are cached.
+    Enabling the cache again resets it.
+    """
+    global _cached_classname, _classname_cache_info
+    _cached_classname, _classname_cache_info = _make_cached_classname(maxsize)
+
+
+def disable_classname_cache():
+    """Disable the classname cache and drop its content"""
+    global _cached_classname, _classname_cache_info
+    _cached_classname, _classname_cache_info = None, None
+
+
+def classname_cache_info() -> CacheInfo | None:
+    """Return the classname cache statistics or `None` if the cache is disabled"""
+    return _classname_cache_info() if _classname_cache_info else None
+
+
+class ClassList(Safe):
+    """
+    Prebuilt `classname` for the static classes, e.g. the long Tailwind lists.
+    Works as the `Safe` string. Calling it appends the extra classes to the static ones.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, *args: CnArg | Iterable[CnArg]):
+        return super().__new__(cls, classname(*args))
+
+    def __call__(self, *args: CnArg | Iterable[CnArg]) -> Safe:
+        extra = classname(*args)
+        if not extra:
+            return self
+        if not self:
+            return extra
+        return Safe(" ".join((self, extra)))
+
+
 def style(s: str) -> Safe:
     """
     Wrapper for styles intended to be included into the `style` attribute.
@@ -293,11 +1435,72 @@ def script(s: str) -> Safe:
     return Safe(s.replace("</", r"<\/"))
 
 
-def json_attr(val: Mapping[str, Any]) -> Safe:
+def _json_default(obj: Any) -> Any:
+    import dataclasses
+
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# Same output as of json.dumps(val, separators=(",", ":")) without constructing the encoder on every call
+_json_encode: Callable[[Any], str | bytes] = _json.JSONEncoder(separators=(",", ":"), default=_json_default).encode
+
+
+class _Ident:
+    """Cache key comparing by identity. Holds the object, so its id can't be reused while cached"""
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj: object):
+        self.obj = obj
+
+    def __hash__(self) -> int:
+        return id(self.obj)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Ident) and other.obj is self.obj
+
+
+def json_attr(val: Any, *, key: Hashable = None, cache=False) -> Safe:
     """
     JSON-format the attribute and HTML-escape it.
+    Dataclasses are converted to dicts.
+
+    Results are cached by the explicit `key` if given or by the identity of `val` if `cache` is set.
+    The cached value should not change afterwards.
     """
-    return Safe(_html_escape(_json.dumps(val, separators=(",", ":"))))
+    if key is None and not cache:
+        res = _json_encode(val)
+        return Safe(_html_escape(res if isinstance(res, str) else res.decode()))
+
+    k = _Ident(val) if key is None else key
+    cached = _json_cache.get(k)
+    if cached is None:
+        res = _json_encode(val)
+        cached = _html_escape(res if isinstance(res, str) else res.decode())
+        _json_cache.put(k, cached)
+    return Safe(cached)
+
+
+def set_json_encoder(encoder: Callable[[Any], str | bytes] | None):
+    """
+    Set the JSON encoder of `json_attr`, e.g. `orjson.dumps`. It takes the value and returns `str` or UTF-8 `bytes`.
+    The `None` restores the default compact `json.dumps`. The cache is cleared.
+    """
+    global _json_encode
+    _json_encode = encoder or _json.JSONEncoder(separators=(",", ":"), default=_json_default).encode
+    _json_cache.clear()
+
+
+def json_attr_cache_info() -> CacheInfo:
+    """Statistics of the `json_attr` cache"""
+    return _json_cache.info()
+
+
+def json_attr_cache_clear():
+    """Drop the cached `json_attr` results"""
+    _json_cache.clear()
 
 
 def csv_attr(*args: (CnArg | Iterable[CnArg])) -> Safe:
@@ -307,6 +1510,335 @@ def csv_attr(*args: (CnArg | Iterable[CnArg])) -> Safe:
     return classname(*args, sep=",")
 
 
+_STR_TYPES = {str, Safe}
+_NUMBER_TYPES = {int, float}
+
+
+def _render_column(vals: Sequence[Any]) -> list[str]:
+    # tolist() converts the NumPy arrays and pandas Series to the Python numbers
+    tolist = getattr(vals, "tolist", None)
+    if tolist is not None:
+        vals = tolist()
+    types = set(map(type, vals))
+    if types <= _STR_TYPES:
+        return escape_many(vals)  # type: ignore[return-value]
+    if types <= _NUMBER_TYPES:
+        return list(map(str, vals))
+    return [text(v) for v in vals]
+
+
+def table(
+    columns: Mapping[str, Sequence[Any]],
+    *,
+    headers: Mapping[str, Arg] | None = None,
+    attrs: Attrs | None = None,
+    cell_attrs: Mapping[str, Attrs] | None = None,
+) -> Safe:
+    """
+    Render the table from the columns of cell values. Same result as rendering each cell with the `text`,
+    but the string columns are escaped in batch over the unique values and the number columns are
+    stringified in batch. NumPy arrays and pandas Series are converted with the `tolist()`.
+
+    The header cells are the `headers` for the column keys, the keys themselves if missing.
+    The `attrs` are the attributes of the `<table>`, the `cell_attrs` are the attributes of column `<td>`s.
+    """
+    headers = headers or {}
+    cell_attrs = cell_attrs or {}
+    cols = [_render_column(vals) for vals in columns.values()]
+    if cols and len({len(col) for col in cols}) != 1:
+        raise ValueError("Columns should be of the same length")
+
+    tds = []
+    for key in columns:
+        a = attr(cell_attrs.get(key)).replace("%", "%%")  # the row is the %-template
+        tds.append(f"<td{ ' ' + a if a else '' }>%s</td>")
+    row = "<tr>" + "".join(tds) + "</tr>"
+    ths = "".join(f"<th>{ text(headers.get(key, key)) }</th>" for key in columns)
+    table_attrs = attr(attrs)
+
+    return Safe(
+        f"<table{ ' ' + table_attrs if table_attrs else '' }><thead><tr>{ ths }</tr></thead>"
+        f"<tbody>{ ''.join(map(row.__mod__, zip(*cols))) }</tbody></table>"
+    )
+
+
+# Thread-safe LRU mapping bounded by both the entries count and the total size of values.
+# Lock is held only for the bookkeeping, never while rendering.
+class _LRU:
+    def __init__(self, maxsize: int | None, maxbytes: int | None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.data: OrderedDict[Hashable, str | _Recorded] = OrderedDict()
+        self.lock = Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def get(self, key: Hashable) -> "str | _Recorded | None":
+        """Raises TypeError for the unhashable keys"""
+        with self.lock:
+            val = self.data.get(key)
+            if val is None:
+                self.misses += 1
+            else:
+                self.data.move_to_end(key)
+                self.hits += 1
+            return val
+
+    def put(self, key: Hashable, val: "str | _Recorded"):
+        size = getsizeof(val)
+        if (self.maxbytes is not None and size > self.maxbytes) or self.maxsize == 0:
+            return
+        data = self.data
+        with self.lock:
+            old = data.pop(key, None)
+            if old is not None:
+                self.nbytes -= getsizeof(old)
+            data[key] = val
+            self.nbytes += size
+            while (self.maxsize is not None and len(data) > self.maxsize) or (
+                self.maxbytes is not None and self.nbytes > self.maxbytes
+            ):
+                self.nbytes -= getsizeof(data.popitem(last=False)[1])
+
+    def discard(self, key: Hashable) -> bool:
+        with self.lock:
+            old = self.data.pop(key, None)
+            if old is None:
+                return False
+            self.nbytes -= getsizeof(old)
+            return True
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.nbytes = 0
+            self.hits = self.misses = self.bypassed = 0
+
+    def bypass(self):
+        with self.lock:
+            self.bypassed += 1
+
+    def info(self) -> CacheInfo:
+        with self.lock:
+            return CacheInfo(
+                self.hits, self.misses, self.bypassed, len(self.data), self.maxsize, self.nbytes, self.maxbytes
+            )
+
+
+def _split_bound(bound: int | None, shards: int) -> int | None:
+    return None if bound is None else -(-bound // shards)
+
+
+# LRU split into the independently locked shards by the key hash, so the threads don't contend for the single lock.
+# Eviction is per shard, i.e. the LRU order and the bounds are approximate.
+class _ShardedLRU:
+    def __init__(self, maxsize: int | None, maxbytes: int | None, shards: int):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.shards = [_LRU(_split_bound(maxsize, shards), _split_bound(maxbytes, shards)) for _ in range(shards)]
+
+    def _shard(self, key: Hashable) -> _LRU:
+        return self.shards[hash(key) % len(self.shards)]
+
+    def get(self, key: Hashable) -> "str | _Recorded | None":
+        """Raises TypeError for the unhashable keys"""
+        return self._shard(key).get(key)
+
+    def put(self, key: Hashable, val: "str | _Recorded"):
+        self._shard(key).put(key, val)
+
+    def discard(self, key: Hashable) -> bool:
+        return self._shard(key).discard(key)
+
+    def clear(self):
+        for shard in self.shards:
+            shard.clear()
+
+    def bypass(self):
+        # the key is unhashable, counted by the shard of the thread to not contend for the single lock
+        self.shards[get_native_id() % len(self.shards)].bypass()
+
+    def info(self) -> CacheInfo:
+        infos = [shard.info() for shard in self.shards]
+        return CacheInfo(
+            sum(i.hits for i in infos),
+            sum(i.misses for i in infos),
+            sum(i.bypassed for i in infos),
+            sum(i.currsize for i in infos),
+            self.maxsize,
+            sum(i.currbytes for i in infos),
+            self.maxbytes,
+        )
+
+
+# Free-threaded Python runs the threads in parallel, the single lock of the cache would serialize them
+_FREE_THREADED = not getattr(sys, "_is_gil_enabled", lambda: True)()
+_LRU_SHARDS = 16
+
+
+def _make_lru(maxsize: int | None, maxbytes: int | None) -> "_LRU | _ShardedLRU":
+    if _FREE_THREADED and (maxsize is None or maxsize >= _LRU_SHARDS):
+        return _ShardedLRU(maxsize, maxbytes, _LRU_SHARDS)
+    return _LRU(maxsize, maxbytes)
+
+
+_JSON_CACHE_MAXSIZE = 256
+_json_cache = _make_lru(_JSON_CACHE_MAXSIZE, None)
+
+
+P = ParamSpec("P")
+S_co = TypeVar("S_co", bound=Safe, covariant=True)
+
+
+class MemoizedComponent(Protocol[P, S_co]):
+    def __call__(self, *args: P.args, **kwargs: P.kwargs) -> S_co: ...
+    def invalidate(self, *args: P.args, **kwargs: P.kwargs) -> bool: ...
+    def cache_info(self) -> CacheInfo: ...
+    def cache_clear(self) -> None: ...
+
+
+# Set by the htmf.assets on import. The recorder renders and returns the result with the assets registered meanwhile,
+# the replayer registers them again and returns the result with the blocks to emit in place
+_Assets = tuple[Any, ...]
+_record_assets: Callable[[Callable[..., Any], tuple[Any, ...], dict[str, Any]], tuple[Any, _Assets]] | None = None
+_replay_assets: Callable[[_Assets, str], str] | None = None
+
+
+class _Recorded:
+    """Memoized result with the assets registered while rendering it"""
+
+    __slots__ = ("assets", "res")
+
+    def __init__(self, res: str, assets: _Assets):
+        self.res = res
+        self.assets = assets
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + getsizeof(self.res)
+
+
+def _render_recording(func: Callable[..., T], args: tuple[Any, ...], kwargs: dict[str, Any]) -> tuple[T, _Assets]:
+    record = _record_assets
+    return (func(*args, **kwargs), ()) if record is None else record(func, args, kwargs)
+
+
+def _replay(res: str, assets: _Assets) -> str:
+    return _replay_assets(assets, res) if assets else res  # type: ignore[misc]
+
+
+_KWD_MARK = object()
+
+
+def _make_key(args: tuple[Any, ...], kwargs: dict[str, Any]) -> Hashable:
+    # typed, as the `lru_cache(typed=True)`: 1, 1.0 and True render differently
+    if kwargs:
+        return (*args, _KWD_MARK, *kwargs.items(), *map(type, args), *map(type, kwargs.values()))
+    return (*args, *map(type, args))
+
+
+@overload
+def component(func: Callable[P, S], /) -> MemoizedComponent[P, S]: ...
+@overload
+def component(
+    *, maxsize: int | None = 128, maxbytes: int | None = None
+) -> Callable[[Callable[P, S]], MemoizedComponent[P, S]]: ...
+def component(
+    func: Callable[P, S] | None = None, /, *, maxsize: int | None = 128, maxbytes: int | None = None
+) -> MemoizedComponent[P, S] | Callable[[Callable[P, S]], MemoizedComponent[P, S]]:
+    """
+    Memoizes the `Safe` result of the component by its arguments.
+    Intended for the pure components of hashable props, e.g. nav bars, badges and icons.
+
+    Cache is the LRU bounded by the entries count (`maxsize`) and the total size
+    of the results in bytes (`maxbytes`). `None` means no bound.
+    Arguments of different types are cached separately, e.g. `1`, `1.0` and `True`.
+    Calls with unhashable arguments bypass the cache. Non-Safe results are not cached.
+    Assets of the `htmf.assets` registered by the component are kept with the result and registered again on the hit.
+
+    Decorated function gains the `invalidate(*args, **kwargs)`, `cache_clear()` and `cache_info()` methods.
+    """
+
+    def decorate(func: Callable[P, S]) -> MemoizedComponent[P, S]:
+        lru = _make_lru(maxsize, maxbytes)
+        get = lru.get
+        put = lru.put
+        make_key = _make_key
+        safe = Safe
+        recorded = _Recorded
+        render = _render_recording
+        replay = _replay
+
+        @wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> S:
+            key = make_key(args, kwargs)
+            try:
+                res = get(key)
+            except TypeError:  # unhashable
+                lru.bypass()
+                return func(*args, **kwargs)
+            if res is not None:
+                return cast(S, replay(res.res, res.assets) if type(res) is recorded else res)  # type: ignore[union-attr]
+            out, assets = render(func, args, kwargs)
+            if not assets:
+                if isinstance(out, safe):
+                    put(key, out)
+                return out
+            rec = recorded(out, assets)
+            if isinstance(out, safe):
+                put(key, rec)
+            return cast(S, replay(out, assets))
+
+        def invalidate(*args: P.args, **kwargs: P.kwargs) -> bool:
+            try:
+                return lru.discard(make_key(args, kwargs))
+            except TypeError:
+                return False
+
+        w = cast(Any, wrapper)
+        w.invalidate = invalidate
+        w.cache_info = lru.info
+        w.cache_clear = lru.clear
+        return cast(MemoizedComponent[P, S], w)
+
+    return decorate if func is None else decorate(func)
+
+
+_HTML_ATTR = "_htmf_html"
+
+
+def cached_html(method: Callable[[T], str]) -> Callable[[T], str]:
+    """
+    Memoizes the `__html__` method per instance. The result is stored in the `_htmf_html` attribute of the instance,
+    `__slots__` classes should declare it. Use `invalidate_html` after the instance is changed.
+    Assets of the `htmf.assets` registered by the method are kept with the result and registered again on the hit.
+    """
+
+    @wraps(method)
+    def __html__(self: T) -> str:
+        res = getattr(self, _HTML_ATTR, None)
+        if res is None:
+            res, assets = _render_recording(method, (self,), {})
+            if assets:  # the result of the __html__ is the markup
+                res = _Recorded(res if isinstance(res, Safe) else Safe(res), assets)
+            try:
+                object.__setattr__(self, _HTML_ATTR, res)  # the frozen dataclasses too
+            except AttributeError:
+                raise TypeError(f"Add '{ _HTML_ATTR }' to the __slots__ of { type(self).__name__ }") from None
+        return _replay(res.res, res.assets) if isinstance(res, _Recorded) else cast(str, res)
+
+    return __html__
+
+
+def invalidate_html(obj: object):
+    """Drop the `__html__` result memoized by the `cached_html`"""
+    try:
+        object.__delattr__(obj, _HTML_ATTR)
+    except AttributeError:
+        pass
+
+
 # aliases
 c = classname
 document = markup
@@ -0,0 +1,188 @@
+"""
+Per-request collector of the components assets: inline stylesheets, scripts, any other `<head>` markup.
+
+    from htmf import assets
+
+    def product_card(p: Product) -> Safe:
+        return ht.m(f"{ assets.style('product-card', CARD_CSS) }<div class='card'>...</div>")
+
+    with assets.collect() as col:
+        page = ht.text(product_card(p) for p in products)  # the card <style> is emitted once, in place
+    log.info("assets: %d bytes saved", col.info().bytes_saved)
+
+Assets are registered by the key, the first one is emitted, the duplicates render nothing.
+With the `Slot` given to the `collect`, nothing is emitted in place, the collected assets fill the slot,
+e.g. in the `<head>`. Without the collector the assets are emitted in place every time.
+
+The collector is the context variable, so the concurrent requests, e.g. asyncio tasks, have their own.
+
+Memoized renders, i.e. the `ht.component`, `ht.cached_html` and `htmf.cache.fragment` decorators,
+keep the assets registered meanwhile with the cached result and register them again on every hit.
+Their blocks to emit in place go before the markup of the render.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Callable, Hashable, Iterator, NamedTuple, TypeVar
+
+import htmf
+from htmf import Attrs, Safe, Slot, _EMPTY, attr, script as _script, stylesheet, text
+
+__all__ = ["AssetsInfo", "Collector", "asset", "collect", "script", "style"]
+
+
+class AssetsInfo(NamedTuple):
+    """Statistics of the collector. Sizes are in UTF-8 bytes"""
+
+    assets: int
+    duplicates: int
+    """Registrations of the already collected keys"""
+    bytes_emitted: int
+    bytes_saved: int
+    """Size of the duplicates not emitted"""
+
+
+class Collector:
+    """Assets of the single `collect` scope. Slot, if any, is filled on exit"""
+
+    __slots__ = ("_blocks", "_lock", "_sizes", "duplicates", "emitted", "saved", "slot")
+
+    def __init__(self, slot: Slot | None = None):
+        self.slot = slot
+        self._sizes: dict[Hashable, int] = {}
+        self._blocks: list[Safe] = []
+        self._lock = Lock()  # per request, e.g. the sections of the `parallel` share it
+        self.duplicates = 0
+        self.emitted = 0
+        self.saved = 0
+
+    def add(self, key: Hashable, block: Safe) -> Safe:
+        """Collect the block. Returns the block to emit in place: the first one unless collected into the slot"""
+        with self._lock:
+            size = self._sizes.get(key)
+            if size is not None:
+                self.duplicates += 1
+                self.saved += size
+                return _EMPTY
+            size = self._sizes[key] = len(block.encode())
+            self.emitted += size
+            if self.slot is None:
+                return block
+            self._blocks.append(block)
+            return _EMPTY
+
+    def seen(self, key: Hashable) -> int | None:
+        """Size of the collected asset, None if not collected yet"""
+        return self._sizes.get(key)
+
+    def blocks(self) -> list[Safe]:
+        """Assets collected for the slot, in order of the first registration"""
+        with self._lock:
+            return list(self._blocks)
+
+    def info(self) -> AssetsInfo:
+        with self._lock:
+            return AssetsInfo(len(self._sizes), self.duplicates, self.emitted, self.saved)
+
+
+class _Recorder(Collector):
+    """Assets registered by the memoized render, kept with its result. Nothing is emitted in place"""
+
+    __slots__ = ("assets",)
+
+    def __init__(self):
+        super().__init__()
+        self.assets: list[tuple[Hashable, Safe]] = []
+
+    def add(self, key: Hashable, block: Safe) -> Safe:
+        with self._lock:
+            if key not in self._sizes:
+                self._sizes[key] = 0
+                self.assets.append((key, block))
+            return _EMPTY
+
+
+_current: ContextVar[Collector | None] = ContextVar("htmf_assets", default=None)
+
+
+@contextmanager
+def collect(slot: Slot | None = None) -> Iterator[Collector]:
+    """
+    Collect the assets registered within the block. Yields the `Collector` to report the statistics.
+
+    If the `slot` is given, the assets fill it on exit, in order of the first registration.
+    For the streaming put the `collect` into the generator of the body, so the held head goes out once it's done:
+
+        head = ht.Slot("assets")
+
+        def body():
+            with assets.collect(head):
+                yield from render_body()
+
+        ht.text_into(response, ht.rope(ht.m("<head>"), head, ht.m("</head>")), body(), encoding="utf-8")
+    """
+    col = Collector(slot)
+    token = _current.set(col)
+    try:
+        yield col
+    finally:
+        _current.reset(token)
+    if slot is not None:
+        slot.fill(col.blocks())
+
+
+def asset(key: Hashable, block: Safe) -> Safe:
+    """Register the ready markup, e.g. the `<link>` or `<script src>`. Returns the block to emit in place"""
+    col = _current.get()
+    return block if col is None else col.add(("asset", key), block)
+
+
+def style(key: Hashable, css: str, attrs: Attrs | None = None) -> Safe:
+    """
+    Register the inline stylesheet. Returns the `<style>` block to emit in place.
+    Keys of the styles, scripts and other assets don't clash, e.g. the component may use its name for all.
+    """
+    key = ("style", key)
+    col = _current.get()
+    if col is not None and col.seen(key) is not None:  # the duplicate, don't build the block
+        return col.add(key, _EMPTY)
+    a = attr(attrs)
+    block = Safe(f"<style{ ' ' + a if a else '' }>{ stylesheet(css) }</style>")
+    return block if col is None else col.add(key, block)
+
+
+def script(key: Hashable, js: str, attrs: Attrs | None = None) -> Safe:
+    """Register the inline script. Returns the `<script>` block to emit in place"""
+    key = ("script", key)
+    col = _current.get()
+    if col is not None and col.seen(key) is not None:  # the duplicate, don't build the block
+        return col.add(key, _EMPTY)
+    a = attr(attrs)
+    block = Safe(f"<script{ ' ' + a if a else '' }>{ _script(js) }</script>")
+    return block if col is None else col.add(key, block)
+
+
+T = TypeVar("T")
+
+
+def _record(func: Callable[..., T], args: tuple[Any, ...], kwargs: dict[str, Any]) -> tuple[T, tuple[Any, ...]]:
+    rec = _Recorder()
+    token = _current.set(rec)
+    try:
+        res = func(*args, **kwargs)
+    finally:
+        _current.reset(token)
+    return res, tuple(rec.assets)
+
+
+def _replay(assets: tuple[Any, ...], res: str) -> str:
+    col = _current.get()
+    head = "".join([block for _, block in assets] if col is None else [col.add(key, block) for key, block in assets])
+    # the non-Safe results, e.g. plain strings, are escaped as the `text` would do
+    return Safe(head + text(res)) if head else res
+
+
+# the memoized renders of the htmf record and replay the assets by these
+htmf._record_assets = _record
+htmf._replay_assets = _replay
@@ -0,0 +1,332 @@
+"""
+Fragment cache for the expensive subtrees keyed explicitly, e.g. product cards and sidebars.
+
+    from htmf.cache import fragment, invalidate_tag
+
+    @fragment(lambda p: ("product", p.id, p.version), ttl=300, tags=lambda p: [f"product:{ p.id }"])
+    def product_card(p: Product) -> Safe: ...
+
+    with fragment(("sidebar", user.id), ttl=60) as f:
+        sidebar = f.value if f.hit else f.set(render_sidebar(user))
+
+    invalidate_tag("product:42")
+
+All fragments share the LRU store bounded by the total size of payloads in bytes.
+Identical payloads are stored once. Only the `Safe` values are cached.
+Assets of the `htmf.assets` registered by the decorated function are kept with the fragment and registered again
+on the hit. The context manager doesn't see the assets, use the decorator for the fragments registering them.
+"""
+
+import time
+from collections import OrderedDict
+from functools import wraps
+from sys import getsizeof
+from threading import Lock
+from typing import Any, Callable, Hashable, Iterable, NamedTuple, ParamSpec, TypeVar, cast
+
+from htmf import _FREE_THREADED, _LRU_SHARDS, Safe, _render_recording, _replay, _split_bound
+
+__all__ = [
+    "DEFAULT_MAXBYTES",
+    "Fragment",
+    "FragmentCacheInfo",
+    "cache_clear",
+    "cache_info",
+    "configure",
+    "fragment",
+    "invalidate",
+    "invalidate_tag",
+]
+
+DEFAULT_MAXBYTES = 32 * 1024 * 1024
+
+P = ParamSpec("P")
+S = TypeVar("S")
+
+Tags = Iterable[str] | Callable[..., Iterable[str]]
+
+# Swapped in tests
+_clock = time.monotonic
+
+
+class FragmentCacheInfo(NamedTuple):
+    """Statistics of the fragment cache. Sizes are in bytes as reported by `sys.getsizeof`"""
+
+    hits: int
+    misses: int
+    currsize: int
+    payloads: int
+    currbytes: int
+    maxbytes: int | None
+    bytes_served: int
+    """Size of the values served from the cache, i.e. not rendered again"""
+    bytes_deduped: int
+    """Size of the identical payloads currently stored once"""
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class _Entry(NamedTuple):
+    value: Safe
+    expires: float | None
+    tags: tuple[str, ...]
+    assets: tuple[Any, ...]
+
+
+class _Store:
+    def __init__(self, maxbytes: int | None):
+        self.maxbytes = maxbytes
+        self.entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self.payloads: dict[str, list[Any]] = {}  # payload -> [stored Safe, references count]
+        self.tags: dict[str, set[Hashable]] = {}
+        self.lock = Lock()
+        self.nbytes = 0
+        self.deduped = 0
+        self.hits = 0
+        self.misses = 0
+        self.served = 0
+
+    def get(self, key: Hashable) -> _Entry | None:
+        """Raises TypeError for the unhashable keys"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires is not None and entry.expires <= _clock():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.served += getsizeof(entry.value)
+            return entry
+
+    def put(self, key: Hashable, value: Safe, ttl: float | None, tags: tuple[str, ...], assets: tuple[Any, ...] = ()):
+        size = getsizeof(value)
+        expires = None if ttl is None else _clock() + ttl
+        with self.lock:
+            if key in self.entries:  # stale even if the new value is not stored
+                self._remove(key)
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+            payload = self.payloads.get(value)
+            if payload is None:
+                payload = self.payloads[value] = [value, 0]
+                self.nbytes += size
+            else:
+                self.deduped += size
+            payload[1] += 1
+            self.entries[key] = _Entry(payload[0], expires, tags, assets)
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+            while self.maxbytes is not None and self.nbytes > self.maxbytes:
+                self._remove(next(iter(self.entries)))
+
+    def _remove(self, key: Hashable):
+        entry = self.entries.pop(key)
+        for tag in entry.tags:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+        payload = self.payloads[entry.value]
+        payload[1] -= 1
+        size = getsizeof(entry.value)
+        if payload[1]:
+            self.deduped -= size
+        else:
+            del self.payloads[entry.value]
+            self.nbytes -= size
+
+    def discard(self, key: Hashable) -> bool:
+        with self.lock:
+            if key not in self.entries:
+                return False
+            self._remove(key)
+            return True
+
+    def discard_tag(self, tag: str) -> int:
+        with self.lock:
+            keys = self.tags.pop(tag, ())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.payloads.clear()
+            self.tags.clear()
+            self.nbytes = self.deduped = 0
+            self.hits = self.misses = self.served = 0
+
+    def configure(self, maxbytes: int | None):
+        with self.lock:
+            self.maxbytes = maxbytes
+            while maxbytes is not None and self.nbytes > maxbytes:
+                self._remove(next(iter(self.entries)))
+
+    def info(self) -> FragmentCacheInfo:
+        with self.lock:
+            return FragmentCacheInfo(
+                self.hits,
+                self.misses,
+                len(self.entries),
+                len(self.payloads),
+                self.nbytes,
+                self.maxbytes,
+                self.served,
+                self.deduped,
+            )
+
+
+# Store split into the independently locked shards by the key hash, so the threads don't contend for the single lock.
+# Eviction and dedupe are per shard, i.e. the LRU order and the bound are approximate.
+class _ShardedStore:
+    def __init__(self, maxbytes: int | None, shards: int):
+        self.maxbytes = maxbytes
+        self.shards = [_Store(_split_bound(maxbytes, shards)) for _ in range(shards)]
+
+    def _shard(self, key: Hashable) -> _Store:
+        return self.shards[hash(key) % len(self.shards)]
+
+    def get(self, key: Hashable) -> _Entry | None:
+        """Raises TypeError for the unhashable keys"""
+        return self._shard(key).get(key)
+
+    def put(self, key: Hashable, value: Safe, ttl: float | None, tags: tuple[str, ...], assets: tuple[Any, ...] = ()):
+        self._shard(key).put(key, value, ttl, tags, assets)
+
+    def discard(self, key: Hashable) -> bool:
+        return self._shard(key).discard(key)
+
+    def discard_tag(self, tag: str) -> int:
+        return sum(shard.discard_tag(tag) for shard in self.shards)
+
+    def clear(self):
+        for shard in self.shards:
+            shard.clear()
+
+    def configure(self, maxbytes: int | None):
+        self.maxbytes = maxbytes
+        for shard in self.shards:
+            shard.configure(_split_bound(maxbytes, len(self.shards)))
+
+    def info(self) -> FragmentCacheInfo:
+        infos = [shard.info() for shard in self.shards]
+        return FragmentCacheInfo(
+            sum(i.hits for i in infos),
+            sum(i.misses for i in infos),
+            sum(i.currsize for i in infos),
+            sum(i.payloads for i in infos),
+            sum(i.currbytes for i in infos),
+            self.maxbytes,
+            sum(i.bytes_served for i in infos),
+            sum(i.bytes_deduped for i in infos),
+        )
+
+
+def _make_store(maxbytes: int | None) -> "_Store | _ShardedStore":
+    return _ShardedStore(maxbytes, _LRU_SHARDS) if _FREE_THREADED else _Store(maxbytes)
+
+
+_store = _make_store(DEFAULT_MAXBYTES)
+
+
+class Fragment:
+    """
+    Cached fragment. Used either as the context manager or as the decorator, see `fragment`.
+    """
+
+    __slots__ = ("hit", "key", "tags", "ttl", "value")
+
+    def __init__(self, key: Hashable | Callable[..., Hashable], ttl: float | None, tags: Tags):
+        self.key = key
+        self.ttl = ttl
+        self.tags = tags if callable(tags) else tuple(tags)  # generators are consumed once
+        self.hit = False
+        self.value: Safe | None = None
+
+    def __enter__(self) -> "Fragment":
+        if callable(self.key) or callable(self.tags):
+            raise TypeError("Callable key and tags are supported by the decorator only")
+        entry = _store.get(self.key)
+        self.hit = entry is not None
+        self.value = None if entry is None else cast(Safe, _replay(entry.value, entry.assets))
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        return None
+
+    def set(self, value: S) -> S:
+        """Store the rendered value unless it's a hit. Non-Safe values are not stored"""
+        if isinstance(value, Safe):
+            if not self.hit:
+                _store.put(self.key, value, self.ttl, self.tags)  # type: ignore[arg-type]
+            self.value = cast(Safe, value)
+        return value
+
+    def __call__(self, func: Callable[P, S]) -> Callable[P, S]:
+        key, ttl, tags = self.key, self.ttl, self.tags
+        get = _store.get
+        put = _store.put
+
+        @wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> S:
+            k = key(*args, **kwargs) if callable(key) else key
+            entry = get(k)
+            if entry is not None:
+                return cast(S, _replay(entry.value, entry.assets))
+            res, assets = _render_recording(func, args, kwargs)
+            if isinstance(res, Safe):
+                put(k, res, ttl, tuple(tags(*args, **kwargs)) if callable(tags) else tags, assets)
+            return cast(S, _replay(cast(str, res), assets))
+
+        return wrapper
+
+
+def fragment(key: Hashable | Callable[..., Hashable], *, ttl: float | None = None, tags: Tags = ()) -> Fragment:
+    """
+    Cache the rendered fragment by the explicit `key` for `ttl` seconds (forever if `None`).
+    Dropping any of the `tags` with the `invalidate_tag` drops the fragment too.
+
+    As the context manager, the `hit` tells whether the `value` is cached, `set(value)` stores the rendered one:
+
+        with fragment(("sidebar", user.id), tags=[f"user:{ user.id }"]) as f:
+            sidebar = f.value if f.hit else f.set(render_sidebar(user))
+
+    As the decorator, the `key` and `tags` could be the callables taking the arguments of the decorated function:
+
+        @fragment(lambda p: ("product", p.id, p.version), tags=lambda p: [f"product:{ p.id }"])
+        def product_card(p: Product) -> Safe: ...
+    """
+    return Fragment(key, ttl, tags)
+
+
+def invalidate(key: Hashable) -> bool:
+    """Drop the fragment by the key. Returns whether it was cached"""
+    return _store.discard(key)
+
+
+def invalidate_tag(tag: str) -> int:
+    """Drop all fragments tagged with the `tag`. Returns the number of dropped fragments"""
+    return _store.discard_tag(tag)
+
+
+def configure(*, maxbytes: int | None = DEFAULT_MAXBYTES):
+    """Set the total size bound of payloads, `None` means no bound. Evicts the least recently used if needed"""
+    _store.configure(maxbytes)
+
+
+def cache_info() -> FragmentCacheInfo:
+    """Statistics of the fragment cache"""
+    return _store.info()
+
+
+def cache_clear():
+    """Drop all fragments and reset the statistics"""
+    _store.clear()
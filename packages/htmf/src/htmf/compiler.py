@@ -0,0 +1,332 @@
+"""
+Opt-in import hook compiling the markup calls ahead of time.
+
+The `ht.m(f"...")` call strips the string built by the f-string and wraps it in the `Safe` at runtime.
+The hook rewrites such calls at the AST level: static parts are stripped once at import time,
+literal markups become the module-level `Safe` constants, the rest is the f-string wrapped in `Safe`
+with no function call and strip in between. Optionally, the whitespaces of static parts are collapsed too.
+
+    import htmf.compiler
+
+    htmf.compiler.install("myapp")  # before importing the myapp modules
+
+Transformed bytecode is cached in `__pycache__` next to the regular one, so cold starts don't pay for the transform.
+"""
+
+import ast
+import hashlib
+import marshal
+import re
+import sys
+from importlib.abc import MetaPathFinder
+from importlib.machinery import ModuleSpec, PathFinder, SourceFileLoader
+from importlib.util import MAGIC_NUMBER, cache_from_source, decode_source
+from types import CodeType, ModuleType
+from typing import Sequence
+
+__all__ = ["DEFAULT_TRIGGER", "install", "transform", "uninstall"]
+
+# Same default as of the htmf-format
+DEFAULT_TRIGGER = r"htmf\.m|htmf\.markup|ht\.m|ht\.markup|htmf\.document|ht\.document"
+
+# Bumped on every change of the generated code to invalidate the cached bytecode
+_VERSION = 3
+
+_SAFE = "__htmf_Safe__"
+_STATIC = "__htmf_static__"
+
+# Contents of these elements are left as is by the minifier
+_RAW_ELEMENTS = ("pre", "textarea", "script", "style")
+_TAG_OPEN_RE = re.compile(r"<(/?)([A-Za-z][A-Za-z0-9-]*)?")
+_IN_TAG_RE = re.compile(r"""[^"'>\t\n\f\r ]*""")
+# HTML whitespaces. The \s would match the &nbsp; too
+_WS_RE = re.compile(r"[\t\n\f\r ]+")
+
+
+class _Minifier:
+    """
+    Collapses the whitespace runs of the static markup parts into the single spaces.
+    Parts are fed in order, the interpolated values between them are skipped and never touched.
+    Whitespaces of the quoted attribute values, contents of the raw elements, comments `<!-- -->`
+    and declarations `<!...>`, `<?...>` are left as is.
+    """
+
+    def __init__(self):
+        self.state = "text"
+        self.quote = ""
+        self.end = ""  # end of the current comment or declaration
+        self.opening = ""  # raw element being opened
+        self.raw: re.Pattern[str] | None = None  # end of the current raw element
+
+    def feed(self, s: str) -> str:
+        out: list[str] = []
+        append = out.append
+        i = 0
+        n = len(s)
+        while i < n:
+            if self.state == "text":
+                j = s.find("<", i)
+                if j < 0:
+                    append(_WS_RE.sub(" ", s[i:]))
+                    break
+                append(_WS_RE.sub(" ", s[i:j]))
+                if s.startswith(("<!", "<?"), j):
+                    self.end = "-->" if s.startswith("<!--", j) else ">"
+                    append(s[j : j + 2])
+                    i = j + 2  # the end is looked up right after the "<!", e.g. "<!-->" is the empty comment
+                    self.state = "comment"
+                    continue
+                m = _TAG_OPEN_RE.match(s, j)
+                assert m
+                name = (m[2] or "").lower()
+                self.opening = name if not m[1] and name in _RAW_ELEMENTS else ""
+                append(m[0])
+                i = m.end()
+                self.state = "tag"
+            elif self.state == "tag":
+                m = _IN_TAG_RE.match(s, i)
+                assert m
+                append(m[0])
+                i = m.end()
+                if i >= n:
+                    break
+                c = s[i]
+                if c in "\"'":
+                    append(c)
+                    self.quote = c
+                    self.state = "quoted"
+                    i += 1
+                elif c == ">":
+                    append(c)
+                    i += 1
+                    if self.opening:
+                        self.raw = re.compile(rf"</{ self.opening }(?=[\t\n\f\r />]|$)", re.IGNORECASE)
+                        self.state = "raw"
+                    else:
+                        self.state = "text"
+                else:
+                    m = _WS_RE.match(s, i)
+                    assert m
+                    append(" ")
+                    i = m.end()
+            elif self.state == "quoted":
+                j = s.find(self.quote, i)
+                if j < 0:
+                    append(s[i:])
+                    break
+                append(s[i : j + 1])
+                i = j + 1
+                self.state = "tag"
+            elif self.state == "comment":
+                j = s.find(self.end, i)
+                if j < 0:
+                    append(s[i:])
+                    break
+                j += len(self.end)
+                append(s[i:j])
+                i = j
+                self.state = "text"
+            else:  # raw
+                assert self.raw
+                m = self.raw.search(s, i)
+                if not m:
+                    append(s[i:])
+                    break
+                append(s[i : m.start()])
+                i = m.start()
+                self.state = "text"
+        return "".join(out)
+
+
+def _extract_name(call: ast.Call) -> str | None:
+    if isinstance(call.func, ast.Name):
+        return call.func.id
+    if isinstance(call.func, ast.Attribute) and isinstance(call.func.value, ast.Name):
+        return f"{call.func.value.id}.{call.func.attr}"
+    return None
+
+
+class _MarkupTransformer(ast.NodeTransformer):
+    def __init__(self, trigger: re.Pattern[str], *, minify: bool):
+        self.trigger = trigger
+        self.minify = minify
+        self.consts: dict[str, str] = {}  # literal -> name of the module-level constant
+        self.used = False
+
+    def visit_Call(self, node: ast.Call):
+        node = self.generic_visit(node)  # type: ignore[assignment]
+        if not isinstance(node, ast.Call) or len(node.args) != 1 or node.keywords:
+            return node
+        name = _extract_name(node)
+        if not name or not self.trigger.fullmatch(name):
+            return node
+
+        arg = node.args[0]
+        if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+            literal = _Minifier().feed(arg.value) if self.minify else arg.value
+            return ast.copy_location(self.hoist(literal.strip()), node)
+        if isinstance(arg, ast.JoinedStr):
+            return ast.copy_location(self.fstring(arg), node)
+        return node
+
+    def hoist(self, literal: str) -> ast.expr:
+        name = self.consts.get(literal)
+        if name is None:
+            name = self.consts[literal] = f"__htmf_{ len(self.consts) }__"
+        return ast.Name(id=name, ctx=ast.Load())
+
+    def fstring(self, node: ast.JoinedStr) -> ast.expr:
+        values = list(node.values)
+        if self.minify:
+            minifier = _Minifier()
+            values = [
+                ast.copy_location(ast.Constant(minifier.feed(v.value)), v) if isinstance(v, ast.Constant) else v
+                for v in values
+            ]
+            values = [v for v in values if not (isinstance(v, ast.Constant) and not v.value)]
+        if values and isinstance(values[0], ast.Constant):
+            values[0] = ast.copy_location(ast.Constant(values[0].value.lstrip()), values[0])
+            if not values[0].value:
+                del values[0]
+        if values and isinstance(values[-1], ast.Constant):
+            values[-1] = ast.copy_location(ast.Constant(values[-1].value.rstrip()), values[-1])
+            if not values[-1].value:
+                del values[-1]
+
+        if not values:
+            return self.hoist("")
+
+        expr: ast.expr = ast.copy_location(ast.JoinedStr(values), node)
+        # interpolated values at the edges may bring the whitespaces, strip them at runtime
+        if not (isinstance(values[0], ast.Constant) and isinstance(values[-1], ast.Constant)):
+            expr = ast.Call(ast.Attribute(expr, "strip", ast.Load()), [], [])
+        self.used = True
+        return ast.Call(ast.Name(_SAFE, ast.Load()), [expr], [])
+
+    def prologue(self) -> list[ast.stmt]:
+        stmts: list[ast.stmt] = [ast.ImportFrom("htmf", [ast.alias("Safe", _SAFE), ast.alias("static", _STATIC)], 0)]
+        for literal, name in self.consts.items():
+            value = ast.Call(ast.Name(_SAFE, ast.Load()), [ast.Constant(literal)], [])
+            value = ast.Call(ast.Name(_STATIC, ast.Load()), [value], [])  # encoded once by the iter_text
+            stmts.append(ast.Assign([ast.Name(name, ast.Store())], value))
+        return stmts
+
+
+def transform(tree: ast.Module, trigger: str | re.Pattern[str] = DEFAULT_TRIGGER, *, minify=False) -> ast.Module:
+    """
+    Rewrite the markup calls of the module. Calls are detected by the `trigger` regex matching the function name.
+    The result is the same as of the runtime `markup`.
+
+    If `minify` is set, whitespace runs of static parts are collapsed into the single spaces.
+    Quoted attribute values and contents of `<pre>`, `<textarea>`, `<script>`, `<style>` are left as is.
+    """
+    transformer = _MarkupTransformer(re.compile(trigger), minify=minify)
+    tree = transformer.visit(tree)
+
+    if transformer.consts or transformer.used:
+        # after the docstring and __future__ imports
+        pos = 0
+        body = tree.body
+        if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant):
+            pos = 1
+        while pos < len(body) and isinstance(body[pos], ast.ImportFrom) and body[pos].module == "__future__":
+            pos += 1
+        lineno = body[pos].lineno if pos < len(body) else 1
+        prologue = transformer.prologue()
+        for stmt in prologue:
+            for sub in ast.walk(stmt):
+                sub.lineno = sub.end_lineno = lineno  # type: ignore[attr-defined]
+                sub.col_offset = sub.end_col_offset = 0  # type: ignore[attr-defined]
+        body[pos:pos] = prologue
+
+    return ast.fix_missing_locations(tree)
+
+
+def _cache_tag(trigger: re.Pattern[str], *, minify: bool) -> str:
+    """Optimization tag of the cached bytecode, distinct for every setting the compiled code depends on"""
+    digest = hashlib.blake2b(f"{ trigger.pattern }\0{ trigger.flags }".encode(), digest_size=4).hexdigest()
+    return f"htmf{ _VERSION }{ 'min' if minify else '' }o{ sys.flags.optimize }t{ digest }"
+
+
+class _Loader(SourceFileLoader):
+    trigger: re.Pattern[str]
+
+    def __init__(self, fullname: str, path: str, trigger: re.Pattern[str], *, minify: bool):
+        super().__init__(fullname, path)
+        self.trigger = trigger
+        self.minify = minify
+
+    def get_code(self, fullname: str) -> CodeType | None:
+        source_path = self.get_filename(fullname)
+        source_bytes = self.get_data(source_path)
+        source = decode_source(source_bytes)
+        if not self.trigger.search(source):
+            return super().get_code(fullname)
+
+        st = self.path_stats(source_path)
+        mtime = int(st["mtime"]) & 0xFFFFFFFF
+        size = st["size"] & 0xFFFFFFFF
+        header = MAGIC_NUMBER + bytes(4) + mtime.to_bytes(4, "little") + size.to_bytes(4, "little")
+        try:
+            cache_path = cache_from_source(source_path, optimization=_cache_tag(self.trigger, minify=self.minify))
+        except NotImplementedError:  # no cache tag
+            cache_path = None
+
+        if cache_path is not None:
+            try:
+                data = self.get_data(cache_path)
+            except OSError:
+                pass
+            else:
+                if data[:16] == header:
+                    try:
+                        return marshal.loads(memoryview(data)[16:])
+                    except (EOFError, ValueError, TypeError):
+                        pass  # corrupted, recompile
+
+        tree = transform(ast.parse(source, source_path), self.trigger, minify=self.minify)
+        code = compile(tree, source_path, "exec", dont_inherit=True)
+
+        if cache_path is not None and not sys.dont_write_bytecode:
+            try:
+                self.set_data(cache_path, header + marshal.dumps(code))
+            except OSError:
+                pass
+        return code
+
+
+class _Finder(MetaPathFinder):
+    def __init__(self, packages: Sequence[str], trigger: re.Pattern[str], *, minify: bool):
+        self.packages = tuple(packages)
+        self.trigger = trigger
+        self.minify = minify
+
+    def find_spec(
+        self, fullname: str, path: Sequence[str] | None, target: ModuleType | None = None
+    ) -> ModuleSpec | None:
+        if self.packages and not any(fullname == p or fullname.startswith(p + ".") for p in self.packages):
+            return None
+        spec = PathFinder.find_spec(fullname, path, target)
+        if spec is None or type(spec.loader) is not SourceFileLoader or not spec.origin:
+            return None
+        spec.loader = _Loader(fullname, spec.origin, self.trigger, minify=self.minify)
+        return spec
+
+
+def install(*packages: str, trigger: str | re.Pattern[str] = DEFAULT_TRIGGER, minify=False):
+    """
+    Install the import hook. Affects the modules imported afterwards.
+
+    Only the modules of listed `packages` (and subpackages) are compiled.
+    If none listed, all modules with the markup calls are.
+    Calls are detected by the `trigger` regex matching the function name.
+    If `minify` is set, whitespaces of static parts are collapsed, see the `transform`.
+    Installing again replaces the previous hook.
+    """
+    uninstall()
+    sys.meta_path.insert(0, _Finder(packages, re.compile(trigger), minify=minify))
+
+
+def uninstall():
+    """Remove the import hook. Already imported modules stay compiled"""
+    sys.meta_path[:] = [f for f in sys.meta_path if not isinstance(f, _Finder)]
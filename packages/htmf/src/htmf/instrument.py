@@ -0,0 +1,197 @@
+"""
+Opt-in instrumentation of the htmf helpers.
+
+    import htmf.instrument
+
+    htmf.instrument.enable()
+    ...
+    for name, st in htmf.instrument.stats().items():
+        metrics.gauge(f"htmf.{ name }.seconds", st.seconds)
+
+The `enable` swaps the `text`, `attr`, `classname` (and their aliases) and the internal escaping functions
+of the htmf module for the counting wrappers, `disable` swaps the originals back.
+Nothing is checked on the hot path, so the disabled instrumentation costs nothing.
+
+Only the calls through the module attributes are counted, e.g. `ht.t(...)`.
+Names imported with `from htmf import text` before the `enable` are bound to the originals.
+"""
+
+import threading
+import weakref
+from functools import wraps
+from time import perf_counter_ns
+from typing import Any, Callable, NamedTuple
+
+import htmf
+
+__all__ = ["HelperStats", "disable", "enable", "enabled", "reset", "stats"]
+
+# helper -> aliases, all swapped together
+_HELPERS = {
+    "text": ("text", "t"),
+    "attr": ("attr",),
+    "classname": ("classname", "c"),
+}
+_NAMES = (*_HELPERS, "escape")
+
+_CALLS, _ARGS, _BYTES, _ESCAPED, _NS = range(5)
+
+
+class HelperStats(NamedTuple):
+    """Counters of the helper. Times include the nested helpers, e.g. the escaping inside the `text`"""
+
+    calls: int
+    args: int
+    """Top-level arguments. The attributes for the `attr`"""
+    bytes: int
+    """Size of the produced strings in UTF-8 bytes"""
+    escaped: int
+    """Strings actually changed by the escaping"""
+    seconds: float
+
+
+# Each thread counts into its own lists, no locks and lost updates on the hot path.
+# Counters of the finished threads are folded into the shared totals, so the pools of short-lived threads
+# don't grow the registry.
+_local = threading.local()
+_registry: dict[int, dict[str, list[int]]] = {}  # id of the counters -> counters of the running thread
+_finished = {name: [0] * 5 for name in _NAMES}
+_registry_lock = threading.Lock()
+
+_originals: dict[str, Any] = {}
+_wrappers: dict[str, Any] = {}
+
+
+class _Owner:
+    """Dropped with the thread-local storage of the finished thread, the finalizer folds its counters"""
+
+    __slots__ = ("__weakref__",)
+
+
+def _fold(counters: dict[str, list[int]]):
+    with _registry_lock:
+        if _registry.pop(id(counters), None) is None:
+            return
+        for name, c in counters.items():
+            total = _finished[name]
+            for i, v in enumerate(c):
+                total[i] += v
+
+
+def _counters() -> dict[str, list[int]]:
+    try:
+        return _local.counters
+    except AttributeError:
+        counters = _local.counters = {name: [0] * 5 for name in _NAMES}
+        owner = _local.owner = _Owner()
+        with _registry_lock:
+            _registry[id(counters)] = counters
+        weakref.finalize(owner, _fold, counters)
+        return counters
+
+
+def _size(s: str) -> int:
+    return len(s) if s.isascii() else len(s.encode("utf-8", "surrogatepass"))
+
+
+def _wrap(name: str, func: Callable[..., str], count_args: Callable[[tuple, dict], int]) -> Callable[..., str]:
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> str:
+        start = perf_counter_ns()
+        res = func(*args, **kwargs)
+        elapsed = perf_counter_ns() - start
+        try:
+            c = _local.counters[name]
+        except AttributeError:
+            c = _counters()[name]
+        c[_CALLS] += 1
+        c[_ARGS] += count_args(args, kwargs)
+        c[_BYTES] += _size(res)
+        c[_NS] += elapsed
+        return res
+
+    return wrapper
+
+
+def _wrap_escape(func: Callable[[str], str]) -> Callable[[str], str]:
+    @wraps(func)
+    def esc(s: str) -> str:
+        start = perf_counter_ns()
+        res = func(s)
+        elapsed = perf_counter_ns() - start
+        try:
+            c = _local.counters["escape"]
+        except AttributeError:
+            c = _counters()["escape"]
+        c[_CALLS] += 1
+        c[_ARGS] += 1
+        c[_BYTES] += _size(res)
+        if len(res) != len(s):  # escaping always makes the string longer
+            c[_ESCAPED] += 1
+        c[_NS] += elapsed
+        return res
+
+    return esc
+
+
+def _count_positional(args: tuple, kwargs: dict) -> int:
+    return len(args)
+
+
+def _count_attrs(args: tuple, kwargs: dict) -> int:
+    return (len(args[0]) if args and args[0] else 0) + len(kwargs)
+
+
+def enabled() -> bool:
+    return bool(_originals)
+
+
+def enable():
+    """
+    Swap the helpers for the counting ones. Counters keep running across the `disable`/`enable`, see `reset`.
+    Enable the escape cache before the instrumentation if both are used.
+    """
+    if _originals:
+        return
+    for name, aliases in _HELPERS.items():
+        func = getattr(htmf, name)
+        wrapper = _wrap(name, func, _count_attrs if name == "attr" else _count_positional)
+        for alias in aliases:
+            _originals[alias] = getattr(htmf, alias)
+            _wrappers[alias] = wrapper
+    for alias in ("_esc", "_attr_esc"):  # the html and the attribute values escaping, both counted as the "escape"
+        _originals[alias] = getattr(htmf, alias)
+        _wrappers[alias] = _wrap_escape(getattr(htmf, alias))
+    for alias, wrapper in _wrappers.items():
+        setattr(htmf, alias, wrapper)
+
+
+def disable():
+    """Swap the original helpers back. Attributes swapped by someone else meanwhile are left as is"""
+    for alias, orig in _originals.items():
+        if getattr(htmf, alias) is _wrappers[alias]:
+            setattr(htmf, alias, orig)
+    _originals.clear()
+    _wrappers.clear()
+
+
+def stats() -> dict[str, HelperStats]:
+    """Counters summed over all threads, keyed by the helper name: `text`, `attr`, `classname`, `escape`"""
+    with _registry_lock:
+        totals = {name: list(c) for name, c in _finished.items()}
+        for counters in _registry.values():
+            for name, c in counters.items():
+                total = totals[name]
+                for i, v in enumerate(c):
+                    total[i] += v
+    return {
+        name: HelperStats(t[_CALLS], t[_ARGS], t[_BYTES], t[_ESCAPED], t[_NS] / 1e9) for name, t in totals.items()
+    }
+
+
+def reset():
+    """Zero the counters"""
+    with _registry_lock:
+        for counters in (_finished, *_registry.values()):
+            for c in counters.values():
+                c[:] = [0] * 5
@@ -0,0 +1,101 @@
+"""
+Allocation gates of the runtime helpers. Bounds are the measured values with some headroom over the reference call
+measured in the same interpreter, tighten them after the allocations are cut and investigate when they trip.
+"""
+
+import gc
+import tracemalloc
+from functools import cache
+from sys import getsizeof
+from typing import Any, Callable
+
+import pytest
+
+import htmf as ht
+from htmf import Safe
+
+N = 1000
+
+
+def measure(func: Callable[[], Any]) -> tuple[float, float]:
+    """Bytes retained by the result and the peak of temporaries per call"""
+    results: list[Any] = [None] * N
+    for _ in range(100):  # warm up the caches, e.g. the type dispatch, and the specializing interpreter
+        func()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        for i in range(N):
+            results[i] = func()
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (retained - start) / N, peak - base
+
+
+SAFE = Safe("<b>bold</b>")
+ROW = ["name", 42, 1.5, None, SAFE, "<a>"]
+
+
+# the retained bytes are compared to the size of result rounded up to the allocator blocks
+ALIGN = 16
+# the interpreter noise of the helper call, e.g. the frames of the larger functions on 3.10
+NOISE = 128
+
+
+def reference(arg: Any) -> Any:
+    return arg
+
+
+@cache
+def baseline() -> tuple[float, float]:
+    """Retained bytes and peak of the call allocating nothing, the worst of a few runs"""
+    runs = [measure(lambda: reference(SAFE)) for _ in range(3)]
+    return max(r for r, _ in runs), max(p for _, p in runs)
+
+
+@pytest.mark.parametrize(
+    ("name", "func", "max_peak"),
+    [
+        # returned as is, the peak is the noise only
+        ("text.single_safe", lambda: ht.text(SAFE), 0),
+        ("classname.single_safe", lambda: ht.classname(SAFE), 0),
+        ("escape.safe", lambda: ht.escape(SAFE), 0),
+        ("attr.empty", lambda: ht.attr(), 0),
+        ("text.empty", lambda: ht.text(None, [], False), 336),  # noqa: FBT003
+        ("text.one_str", lambda: ht.text("plain"), 336),
+        ("text.row", lambda: ht.text(ROW), 1936),
+        ("attr.static", lambda: ht.attr({"id": "x", "class": "a b", "hidden": True}), 636),
+        ("classname.strings", lambda: ht.classname("a", "b", None, ["c", "d"]), 586),
+    ],
+)
+def test_allocations(name: str, func: Callable[[], Any], max_peak: int):
+    """The `max_peak` is over the reference call, the result retained per call is at least the ALIGN bytes"""
+    ref_retained, ref_peak = baseline()
+    res = func()
+    max_retained = ref_retained + (ALIGN if res is func() else getsizeof(res) + ALIGN)
+    max_peak += ref_peak + NOISE
+    retained, peak = measure(func)
+    assert retained <= max_retained, f"{ name }: { retained } bytes retained per call"
+    assert peak <= max_peak, f"{ name }: { peak } bytes peak"
+
+
+def test_as_is():
+    assert ht.text(SAFE) is SAFE
+    assert ht.text([SAFE]) is SAFE
+    assert ht.text(None, SAFE) is SAFE
+    assert ht.classname(SAFE) is SAFE
+    assert ht.classname(Safe(" a ")) == "a"
+    assert ht.classname(Safe("")) == ""
+    assert ht.text() is ht.text(None) is ht.attr() is ht.attr({})
+    # subclasses are not returned as is
+    assert type(ht.text(ht.ClassList("a"))) is Safe
+
+
+def test_safe_slots():
+    assert not hasattr(Safe("a"), "__dict__")
@@ -0,0 +1,179 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import htmf as ht
+from htmf import assets, cache
+
+CSS = ".card { color: red }"
+JS = "document.querySelectorAll('.card').forEach(init) // </script>"
+STYLE = "<style>.card { color: red }</style>"
+SCRIPT = "<script type=\"module\">document.querySelectorAll('.card').forEach(init) // <\\/script></script>"
+
+
+def card(i: int):
+    return ht.m(
+        f"{ assets.style('card', CSS) }{ assets.script('card', JS, {'type': 'module'}) }<div class='card'>{ i }</div>"
+    )
+
+
+def test_in_place():
+    with assets.collect() as col:
+        page = ht.t(card(i) for i in range(200))
+    assert page == STYLE + SCRIPT + "".join(f"<div class='card'>{ i }</div>" for i in range(200))
+
+    size = len(STYLE.encode()) + len(SCRIPT.encode())
+    assert col.info() == assets.AssetsInfo(2, 398, size, size * 199)
+    assert col.blocks() == []
+
+
+def test_no_collector():
+    assert card(1) == card(1) == STYLE + SCRIPT + "<div class='card'>1</div>"
+    link = ht.m("<link rel=stylesheet href='/card.css'>")
+    assert assets.asset("card.css", link) is link
+
+
+def test_slot():
+    head = ht.Slot("assets")
+    with assets.collect(head) as col:
+        body = ht.rope(card(i) for i in range(3))
+        assets.asset("font", ht.m("<link rel=preload href='/f.woff2'>"))
+        assets.style("card", "ignored, the key is collected")
+    assert col.info().assets == 3
+    page = ht.rope(ht.m("<head>"), head, ht.m("</head><body>"), body, ht.m("</body>")).flatten()
+    assert page == (
+        f"<head>{ STYLE }{ SCRIPT }<link rel=preload href='/f.woff2'></head>"
+        "<body><div class='card'>0</div><div class='card'>1</div><div class='card'>2</div></body>"
+    )
+
+
+def test_streaming():
+    head = ht.Slot("assets")
+
+    def body():
+        with assets.collect(head):
+            yield ht.FLUSH
+            for i in range(3):
+                yield card(i)
+
+    chunks = list(ht.iter_text(ht.rope(ht.m("<head>"), head, ht.m("</head>")), body(), chunk_size=1))
+    assert "".join(chunks) == f"<head>{ STYLE }{ SCRIPT }</head>" + "".join(
+        f"<div class='card'>{ i }</div>" for i in range(3)
+    )
+
+
+def test_scopes():
+    with assets.collect() as outer:
+        assert assets.style("a", "a{}") == "<style>a{}</style>"
+        with assets.collect() as inner:
+            assert assets.style("a", "a{}") == "<style>a{}</style>"
+            assert assets.style("a", "a{}") == ""
+        assert assets.style("a", "a{}") == ""
+    assert assets.style("a", "a{}") == "<style>a{}</style>"
+    assert (outer.info().duplicates, inner.info().duplicates) == (1, 1)
+
+    # failed render doesn't fill the slot
+    head = ht.Slot()
+    with pytest.raises(ZeroDivisionError), assets.collect(head):
+        assets.style("a", "a{}")
+        1 / 0  # noqa: B018
+    assert not head.filled
+
+
+def test_concurrent_requests():
+    async def request(n: int):
+        with assets.collect() as col:
+            parts = []
+            for i in range(n):
+                parts.append(card(i))
+                await asyncio.sleep(0)
+        return ht.t(parts), col.info()
+
+    async def main():
+        return await asyncio.gather(*(request(n) for n in (1, 5, 10)))
+
+    for (page, info), n in zip(asyncio.run(main()), (1, 5, 10)):
+        assert page.count("<style>") == 1
+        assert info.duplicates == 2 * (n - 1)
+
+    # the sections rendered by the `parallel` in the thread pool share the collector of the caller
+    with assets.collect() as col:
+        sections = ht.parallel([lambda i=i: card(i) for i in range(20)])
+        with ThreadPoolExecutor(4) as pool:
+            sections += ht.parallel([lambda i=i: card(i) for i in range(20)], pool)
+    assert ht.t(sections).count("<style>") == 1
+    assert col.info().duplicates == 2 * 39
+
+
+def test_memoized():
+    @ht.component
+    def memo_card(i: int):
+        return card(i)
+
+    class Chip:
+        __slots__ = ("_htmf_html", "i")
+
+        def __init__(self, i: int):
+            self.i = i
+
+        @ht.cached_html
+        def __html__(self):
+            return card(self.i)
+
+    @cache.fragment(lambda i: ("memo-card", i))
+    def fragment_card(i: int):
+        return card(i)
+
+    cache.cache_clear()
+    chips = [Chip(i) for i in range(3)]
+    for render in (memo_card, lambda i: ht.t(chips[i]), fragment_card):
+        # assets are registered again on the hit, into the slot of every request
+        for _ in range(2):
+            head = ht.Slot("assets")
+            with assets.collect(head) as col:
+                body = ht.t(render(i) for i in range(3))
+            assert head.flatten() == STYLE + SCRIPT
+            assert body == "".join(f"<div class='card'>{ i }</div>" for i in range(3))
+            assert col.info().duplicates == 4
+
+        # in place, once per request
+        for _ in range(2):
+            with assets.collect():
+                page = ht.t(render(i) for i in (2, 1, 0))
+            assert page == STYLE + SCRIPT + "".join(f"<div class='card'>{ i }</div>" for i in (2, 1, 0))
+
+        # and every time without the collector
+        assert render(1) == STYLE + SCRIPT + "<div class='card'>1</div>"
+
+    # nested memoized renders pass the assets up
+    @ht.component
+    def cards(n: int):
+        return ht.t(memo_card(i) for i in range(n))
+
+    for _ in range(2):
+        head = ht.Slot("assets")
+        with assets.collect(head):
+            assert cards(2) == "<div class='card'>0</div><div class='card'>1</div>"
+        assert head.flatten() == STYLE + SCRIPT
+    cache.cache_clear()
+
+
+def test_memoized_plain_result_escaped():
+    @ht.component
+    def label(x: str):
+        assets.style("l", ".l{}")
+        return x
+
+    @cache.fragment(lambda x: ("label", x))
+    def fragment_label(x: str):
+        assets.style("l", ".l{}")
+        return x
+
+    cache.cache_clear()
+    for render in (label, fragment_label):
+        for _ in range(2):
+            assert ht.t(render("<script>")) == "<style>.l{}</style>&lt;script&gt;"
+            with assets.collect():
+                assert ht.t(render("<script>"), render("<script>")) == "<style>.l{}</style>&lt;script&gt;&lt;script&gt;"
+    cache.cache_clear()
@@ -1,6 +1,17 @@
 # import pytest
 
-from htmf import text, Safe, markup, classname, attr, csv_attr, script, json_attr, escape, stylesheet
+import asyncio
+import io
+import sys
+from dataclasses import dataclass
+
+from htmf import text, Safe, markup, classname, attr, csv_attr, script, json_attr, escape, stylesheet, iter_text, FLUSH
+from htmf import atext, component, escape_many
+from htmf import Rope, rope, text_into, Slot, static
+from htmf import AttrTemplate, ClassList, enable_classname_cache, disable_classname_cache, classname_cache_info
+from htmf import enable_escape_cache, disable_escape_cache, escape_cache_info, style, handler
+from htmf import set_json_encoder, json_attr_cache_info, json_attr_cache_clear
+from htmf import cached_html, invalidate_html, parallel, table, register
 
 
 class BadArg:
@@ -19,6 +30,58 @@ def test_escape():
     assert isinstance(Safe("<div></div>"), Safe)
 
 
+def test_escape_many():
+    cases = [
+        [],
+        ["<a>"],
+        ["a", "b"],
+        ["<div>", "plain", "'q'", '"dq"', "&amp;", "", " "],
+        ["<x>", Safe("<y>"), "z", Safe("&lt;")] * 3,
+        ["active", "<b>", "active", "x&y"] * 10,
+        ["a\x00<b>", "c", "d", "<e>", "f"],  # separator inside the string
+        [Safe("a"), Safe("<b>")],
+    ]
+    for strings in cases:
+        res = escape_many(strings)
+        assert res == [escape(s) for s in strings]
+        assert all(isinstance(r, Safe) for r in res)
+
+    assert escape_many(s for s in ("<", ">")) == ["&lt;", "&gt;"]
+
+
+def test_escape_cache():
+    assert escape_cache_info() is None
+    enable_escape_cache(maxsize=3, max_length=8)
+    try:
+        assert escape_cache_info() == (0, 0, 0, 0, 3, 0, None)
+
+        for _ in range(2):
+            assert text("<a>", ["<a>", Safe("<b>")], "long <string>") == "&lt;a&gt;&lt;a&gt;<b>long &lt;string&gt;"
+            assert attr({"<k>": "<a>"}) == '&lt;k&gt;="<a>"'
+            assert classname("<a>", ["<c>"]) == "&lt;a&gt; &lt;c&gt;"
+            assert style("<a>") == handler("<a>") == escape("<a>") == "&lt;a&gt;"
+
+        info = escape_cache_info()
+        assert info
+        assert (info.misses, info.currsize) == (2, 2)  # attribute names are not escaped by the cache
+        assert info.hits == 14
+        assert info.bypassed == 2
+        assert info.currbytes > 0
+
+        # oldest entries are evicted
+        escape("<d>")
+        escape("<e>")
+        info = escape_cache_info()
+        assert info and (info.misses, info.currsize) == (4, 3)
+
+        enable_escape_cache()
+        assert escape_cache_info() == (0, 0, 0, 0, 4096, 0, None)
+    finally:
+        disable_escape_cache()
+    assert escape_cache_info() is None
+    assert text("<a>") == "&lt;a&gt;"
+
+
 def test_text():
     # smoke
     assert text("text") == "text"
@@ -71,6 +134,271 @@ def test_text():
     assert isinstance(text("<div></div>", 1, 2, 3), Safe)
 
 
+def test_iter_text():
+    args = (0, 1, " foo ", True, [0, 1, " foo ", None, False], "<more>", ["a", Safe("<b>")], BadArg())
+    assert "".join(iter_text(*args)) == text(*args)
+    assert "".join(iter_text(*args, sep=", ")) == text(*args, sep=", ")
+    assert "".join(iter_text(*args, sep=", ", chunk_size=1)) == text(*args, sep=", ")
+    assert list(iter_text()) == []
+    assert list(iter_text(None, [], False)) == []  # noqa: FBT003
+
+    # chunking. tokens are never split
+    assert list(iter_text("ab", "cd", "e", chunk_size=3)) == ["abcd", "e"]
+    assert list(iter_text("abcd", "e", chunk_size=1)) == ["abcd", "e"]
+    assert list(iter_text("a", "b", "c", sep="-", chunk_size=3)) == ["a-b", "-c"]
+
+    # generators are consumed lazily
+    consumed = []
+
+    def rows():
+        for i in range(3):
+            consumed.append(i)
+            yield Safe(f"<tr>{i}</tr>")
+
+    it = iter_text(Safe("<head></head>"), FLUSH, rows())
+    assert next(it) == "<head></head>"
+    assert consumed == []
+    assert list(it) == ["<tr>0</tr><tr>1</tr><tr>2</tr>"]
+
+    # flush inside the iterables, empty flushes are ignored
+    assert list(iter_text(FLUSH, ["a", FLUSH, FLUSH, "b"], FLUSH)) == ["a", "b"]
+    # other helpers are dropping the marker
+    assert text("a", FLUSH, ["b", FLUSH]) == "ab"
+
+    assert all(isinstance(chunk, Safe) for chunk in iter_text("a", FLUSH, "b"))
+
+
+def test_atext():
+    async def val(v):
+        return v
+
+    async def agen():
+        yield "<a>"
+        yield val(1)
+        yield None
+
+    args = (0, " foo ", True, [0, 1, None, False], "<more>", ["a", Safe("<b>")], BadArg(), {"k": 1})
+    assert asyncio.run(atext(*args)) == text(*args)
+    assert asyncio.run(atext(*args, sep=",")) == text(*args, sep=",")
+
+    assert (
+        asyncio.run(atext(val("<x>"), agen(), [val(Safe("<y>")), "z", val(None)], val([1, 2]), (i for i in range(2))))
+        == "&lt;x&gt;&lt;a&gt;1<y>z1201"
+    )
+    assert asyncio.run(atext()) == ""
+    assert isinstance(asyncio.run(atext(val("a"))), Safe)
+
+    # nested async values are resolved recursively
+    async def nested():
+        yield agen()
+        yield [2]
+
+    assert asyncio.run(atext(["<", agen(), val(agen())], val(val("<x>")), val([val(1), agen()]))) == (
+        "&lt;&lt;a&gt;1&lt;a&gt;1&lt;x&gt;1&lt;a&gt;1"
+    )
+    assert asyncio.run(atext(nested(), [nested()])) == "&lt;a&gt;1&lt;a&gt;1"  # lists two levels deep are dropped
+
+    # errors of the async iterables are raised, except for the not iterable ones
+    class NotAsyncIterable:
+        def __aiter__(self):
+            raise TypeError
+
+    async def failing():
+        yield "a"
+        raise TypeError("inside")
+
+    assert asyncio.run(atext(NotAsyncIterable(), [NotAsyncIterable(), "b"])) == "b"
+    try:
+        asyncio.run(atext(failing()))
+    except TypeError as e:
+        assert str(e) == "inside"
+    else:
+        raise AssertionError
+
+    # awaitables are resolved concurrently: the first one completes only if the second one runs too
+    async def concurrently():
+        ev = asyncio.Event()
+
+        async def waiter():
+            await ev.wait()
+            return "waited"
+
+        async def setter():
+            ev.set()
+            return "set"
+
+        return await asyncio.wait_for(atext(waiter(), [setter()], sep=" "), 1)
+
+    assert asyncio.run(concurrently()) == "waited set"
+
+
+def test_rope():
+    args = (0, " foo ", True, [0, 1, None, False], "<more>", ["a", Safe("<b>")], BadArg(), HtmlDunder("<c>"))
+    assert rope(*args).flatten() == text(*args)
+    assert rope(*args, sep=", ").flatten() == text(*args, sep=", ")
+    assert isinstance(rope("a").flatten(), Safe)
+    assert rope().flatten() == ""
+
+    # nested ropes are held by reference and flattened once
+    leaf = rope(Safe("<i>leaf</i>"))
+    tree = leaf
+    for i in range(15):
+        tree = rope(Safe(f"<div>{i}"), tree, Safe("</div>"))
+    node = tree
+    for _ in range(15):
+        node = node.toks[1]
+    assert node is leaf
+    expected = leaf.flatten()
+    for i in range(15):
+        expected = text(Safe(f"<div>{i}"), expected, Safe("</div>"))
+    assert tree.flatten() == expected
+    assert "".join(iter_text(tree, chunk_size=10)) == expected
+    assert str(tree) == expected
+
+    # no recursion limits
+    deep = rope("x")
+    for _ in range(5000):
+        deep = rope(deep)
+    assert deep.flatten() == "x"
+
+    # the rope is the single token for the separators
+    r = rope("a", "b", sep="-")
+    assert text(r, r, sep=",") == "a-b,a-b"
+    assert "".join(iter_text(r, [r, rope()], sep=",")) == "a-b,a-b,"
+    assert rope(r, r, sep=",").flatten() == "a-b,a-b"
+
+    # compatible with utilities and f-strings
+    assert text(rope("<a>")) == "&lt;a&gt;"
+    assert attr(title=rope("<a>")) == 'title="&lt;a&gt;"'
+    assert markup(f"<p>{ rope('<a>') }</p>") == "<p>&lt;a&gt;</p>"
+    assert f"{ rope('a') :>3}" == "  a"
+
+    # flush markers are kept for the streams
+    assert list(iter_text(rope("a", FLUSH, "b"), chunk_size=100)) == ["a", "b"]
+    assert rope("a", FLUSH, "b", sep=",").flatten() == "a,b"
+
+    assert isinstance(rope(), Rope)
+
+
+def test_slot():
+    title = Slot("title")
+    assets = Slot()
+    assert not title.filled
+    assert repr(title) == "Slot('title')"
+
+    def body():
+        yield Safe("<main>")
+        title.fill("Tom & Jerry")
+        assets.fill(Safe("<link rel=stylesheet href=a.css>"), rope(Safe("<script src=b.js></script>")))
+        yield "<text>"
+        yield Safe("</main>")
+
+    def page():
+        head = rope(Safe("<head><title>"), title, Safe("</title>"), assets, Safe("</head>"))
+        return rope(head, FLUSH, body(), sep="\n")
+
+    expected = text(
+        Safe("<head><title>Tom &amp; Jerry</title><link rel=stylesheet href=a.css><script src=b.js></script></head>"),
+        Safe("<main>"), "<text>", Safe("</main>"),
+        sep="\n",
+    )
+    # the string path: the body fills the slots while the rope is built, flattened once
+    assert page().flatten() == expected
+    assert title.filled and text(title) == "Tom &amp; Jerry"
+    assert markup(f"<h1>{ title }</h1>") == "<h1>Tom &amp; Jerry</h1>"
+
+    # the streaming path: the chunks behind the unfilled slot are held until the body fills it
+    for encoding in (None, "utf-8"):
+        for chunk_size in (1, 16384):
+            title.toks = assets.toks = None  # unfill
+            head = rope(Safe("<head><title>"), title, Safe("</title>"), assets, Safe("</head>"))
+            chunks = list(iter_text(head, FLUSH, body(), sep="\n", chunk_size=chunk_size, encoding=encoding))
+            res = b"".join(chunks).decode() if encoding else "".join(chunks)  # type: ignore[arg-type]
+            assert res == expected
+    w = io.StringIO()
+    title.toks = assets.toks = None
+    text_into(w, rope(Safe("<head><title>"), title, Safe("</title>"), assets, Safe("</head>")), FLUSH, body(), sep="\n")
+    assert w.getvalue() == expected
+
+    # the slot is streamed as soon as it's filled
+    slot = Slot("count")
+    chunks = list(iter_text(Safe("<b>"), slot, Safe("</b>"), (slot.fill(i) and i for i in range(3)), chunk_size=1))
+    assert chunks == ["<b>", "0", "</b>", "0", "1", "2"]
+    assert slot.fill("a", "b", sep=" ").flatten() == "a b"
+
+    # unfilled slots
+    for read in (
+        lambda: text(Slot("x")),
+        lambda: rope("a", Slot("x")).flatten(),
+        lambda: list(iter_text("a", Slot("x"), "b")),
+        lambda: f"{ Slot('x') }",
+    ):
+        try:
+            read()
+        except ValueError as e:
+            assert str(e) == "Slot('x') is not filled"
+        else:
+            raise AssertionError
+
+
+def test_iter_text_encoded():
+    big = Safe("<nav>" + "ж" * 500 + "</nav>")
+    args = (0, " foo ", True, [0, 1, None, False], "<Ünïcode>", ["a", Safe("<b>")], big, rope("<c>", big), big)
+    for sep in ("", ", "):
+        for chunk_size in (1, 100, 16384):
+            chunks = list(iter_text(*args, sep=sep, chunk_size=chunk_size, encoding="utf-8"))
+            assert all(isinstance(chunk, bytes) for chunk in chunks)
+            assert b"".join(chunks) == text(*args, sep=sep).encode("utf-8")
+            assert [c.decode() for c in chunks] == list(iter_text(*args, sep=sep, chunk_size=chunk_size))
+    assert b"".join(iter_text("<€>", encoding="cp1252")) == "&lt;€&gt;".encode("cp1252")
+
+    # static fragments are encoded once, the rest is not cached
+    first = list(iter_text(FLUSH, big, FLUSH, encoding="utf-8"))
+    second = list(iter_text(Safe("x"), FLUSH, big, FLUSH, encoding="utf-8"))
+    assert first[0] == second[1] and first[0] is not second[1]
+    assert static(big) is big
+    first = list(iter_text(FLUSH, big, FLUSH, encoding="utf-8"))
+    second = list(iter_text(Safe("x"), FLUSH, big, FLUSH, encoding="utf-8"))
+    assert first[0] is second[1]
+    small = Safe("<b>")
+    assert static(small) is small
+    try:
+        static("<b>")  # type: ignore[arg-type]
+    except TypeError:
+        pass
+    else:
+        raise AssertionError
+    assert list(iter_text(encoding="utf-8")) == []
+
+    buf = io.BytesIO()
+    assert text_into(buf, *args, encoding="utf-8") == len(text(*args).encode("utf-8"))
+    assert buf.getvalue() == text(*args).encode("utf-8")
+
+
+def test_text_into():
+    class Writer:
+        def __init__(self):
+            self.writes: list[str] = []
+
+        def write(self, s: str):
+            self.writes.append(s)
+
+    args = (0, " foo ", True, [0, 1, None, False], "<more>", ["a", Safe("<b>")], rope("<c>", "d"))
+    buf = io.StringIO()
+    assert text_into(buf, *args, sep=",") == len(text(*args, sep=","))
+    assert buf.getvalue() == text(*args, sep=",")
+
+    # small writes are batched
+    w = Writer()
+    text_into(w, (Safe(f"<td>{i}</td>") for i in range(100)), chunk_size=50)
+    assert "".join(w.writes) == text(Safe(f"<td>{i}</td>") for i in range(100))
+    assert 1 < len(w.writes) < 100
+
+    w = Writer()
+    assert text_into(w) == 0
+    assert w.writes == []
+
+
 def test_markup():
     assert markup("<div>") == "<div>"
     # assert markup(True) == ""
@@ -116,6 +444,50 @@ def test_classname():
     assert isinstance(classname("flex"), Safe)
 
 
+def test_classname_cache():
+    cases = [
+        ("visible", "invisible", True, [False, "flex"]),
+        ("  flex  ", " grid", " \n float ", None),
+        (1, 2, 3, "ok", BadArg, [BadArg(), BadArg], "ok"),
+        ("<here>",),
+        (Safe("<here>"),),
+        (Safe("<here>"), ["<here>"]),
+        ("<here>", [Safe("<here>")]),
+        (HtmlDunder("a"), [HtmlDunder("<c>"), "<c>"]),
+        ([],),
+        (),
+    ]
+    expected = [classname(*args) for args in cases]
+    expected_csv = [csv_attr(*args) for args in cases]
+
+    assert classname_cache_info() is None
+    enable_classname_cache(maxsize=8)
+    try:
+        for _ in range(2):
+            assert [classname(*args) for args in cases] == expected
+            assert [csv_attr(*args) for args in cases] == expected_csv
+            assert all(isinstance(classname(*args), Safe) for args in cases)
+        info = classname_cache_info()
+        assert info and info.currsize == 8
+        # the single safe token is returned as is, bypassing the cache
+        assert info.hits + info.misses == 54
+    finally:
+        disable_classname_cache()
+    assert classname_cache_info() is None
+
+
+def test_classlist():
+    btn = ClassList("px-4  ", ["py-2", False and "x"], "<b>")
+    assert btn == "px-4 py-2 &lt;b&gt;"
+    assert isinstance(btn, Safe)
+    assert btn() is btn
+    assert btn(False, None) is btn  # noqa: FBT003
+    assert btn("bg-red", True and "active") == "px-4 py-2 &lt;b&gt; bg-red active"
+    assert isinstance(btn("x"), Safe)
+    assert ClassList()("a") == "a"
+    assert classname(btn, "x") == "px-4 py-2 &lt;b&gt; x"
+
+
 def test_attr():
     assert (
         attr(
@@ -164,6 +536,31 @@ def test_attr():
     assert isinstance(attr(foo="bar"), Safe)
 
 
+def test_attr_template():
+    static = {"type": "text", "class": "form-control", " <k> ": "v", "hidden": False, "": True, "autofocus": True}
+    tpl = AttrTemplate(static, "name", "value", "disabled", "data-x", Safe("<raw>"))
+
+    assert tpl() == attr(static)
+    assert tpl() is tpl()
+    assert isinstance(tpl(), Safe)
+
+    for vals in [
+        {"name": "email"},
+        {"name": "<x>", "value": Safe("<y>"), "disabled": True},
+        {"value": 0, "disabled": False, "data-x": None},
+        {"data-x": HtmlDunder("<z>"), Safe("<raw>"): True},
+        {"type": "password", "hidden": True, "autofocus": None},  # overrides
+        {"name": [1, 2]},  # unsupported type
+        {"unknown": "1", "name": "n"},  # not declared key
+    ]:
+        assert tpl(vals) == attr(static, **vals)
+        assert tpl(**vals) == attr(static, **vals)
+    assert tpl({"name": "a"}, name="b") == attr(static, name="b")
+
+    assert AttrTemplate()() == ""
+    assert AttrTemplate(None, "id")(id=1) == 'id="1"'
+
+
 def test_csv_attr():
     assert csv_attr("load", "from:body delay:1ms", "every 20s") == "load,from:body delay:1ms,every 20s"
     assert csv_attr("<load>", "from:body delay:1ms", "every 20s") == "&lt;load&gt;,from:body delay:1ms,every 20s"
@@ -176,6 +573,56 @@ def test_json_attr():
     assert isinstance(json_attr({"a": "b", "c": "d"}), Safe)
 
 
+def test_json_attr_fast_paths():
+    import json
+    from htmf import _html_escape
+
+    values = [
+        {"a": "<b> & 'c'", "d": [1, 2.5, None, True], "é": "\u2028"},
+        [1, "two", {"x": '"'}],
+        "plain",
+        42,
+    ]
+    for val in values:
+        assert json_attr(val) == _html_escape(json.dumps(val, separators=(",", ":")))
+
+    @dataclass
+    class Config:
+        name: str
+        tags: list[str]
+
+    assert json_attr(Config("<x>", ["a"])) == json_attr({"name": "<x>", "tags": ["a"]})
+    assert json_attr([Config("a", [])]) == json_attr([{"name": "a", "tags": []}])
+    try:
+        json_attr({"a": BadArg()})
+        raise AssertionError("should fail")
+    except TypeError:
+        pass
+
+    # cache by identity and by key
+    json_attr_cache_clear()
+    config = {"a": [1, 2, 3]}
+    first = json_attr(config, cache=True)
+    assert json_attr(config, cache=True) == first
+    assert json_attr({"a": [1, 2, 3]}, cache=True) == first
+    assert json_attr_cache_info().hits == 1
+    assert json_attr_cache_info().currsize == 2
+    assert json_attr({"b": 1}, key="config") == json_attr({"c": 2}, key="config") == '{&quot;b&quot;:1}'
+    assert isinstance(json_attr(config, cache=True), Safe)
+    json_attr_cache_clear()
+    assert json_attr_cache_info().currsize == 0
+
+    # pluggable encoder, str or bytes
+    try:
+        set_json_encoder(lambda val: json.dumps(val, separators=(",", ":")).encode())
+        assert json_attr({"a": "<"}) == '{&quot;a&quot;:&quot;&lt;&quot;}'
+        set_json_encoder(lambda val: "[]")
+        assert json_attr({"a": 1}) == "[]"
+    finally:
+        set_json_encoder(None)
+    assert json_attr({"a": 1}) == '{&quot;a&quot;:1}'
+
+
 def test_script():
     assert script("console.log('<script></script)')") == r"console.log('<script><\/script)')"
 
@@ -212,3 +659,310 @@ def test_html_dunder():
 
     assert classname(HtmlDunder("a"), [HtmlDunder("b"), HtmlDunder("<c>"), "<bla>"]) == "a b <c> &lt;bla&gt;"
 
+
+
+@dataclass(frozen=True)
+class Props:
+    name: str
+    count: int = 0
+
+
+def test_component():
+    calls = []
+
+    @component
+    def badge(props: Props, *, active=False) -> Safe:
+        calls.append(props)
+        return markup(f"<span class='{ classname('badge', active and 'active') }'>{ text(props.name) }</span>")
+
+    assert badge(Props("<a>")) == "<span class='badge'>&lt;a&gt;</span>"
+    assert badge(Props("<a>")) == "<span class='badge'>&lt;a&gt;</span>"
+    assert badge(Props("<a>"), active=True) == "<span class='badge active'>&lt;a&gt;</span>"
+    assert len(calls) == 2
+    info = badge.cache_info()
+    assert (info.hits, info.misses, info.bypassed, info.currsize) == (1, 2, 0, 2)
+    assert info.currbytes > 0
+
+    assert badge.invalidate(Props("<a>"))
+    assert not badge.invalidate(Props("<a>"))
+    badge(Props("<a>"))
+    assert len(calls) == 3
+
+    badge.cache_clear()
+    assert badge.cache_info() == (0, 0, 0, 0, 128, 0, None)
+
+    # unhashable arguments are bypassing the cache
+    @component
+    def items(vals: list[str]) -> Safe:
+        calls.append(vals)
+        return text(vals)
+
+    calls.clear()
+    assert items(["a", "b"]) == "ab"
+    assert items(["a", "b"]) == "ab"
+    assert len(calls) == 2
+    assert items.cache_info().bypassed == 2
+    assert not items.invalidate(["a"])
+
+    # bounds
+    @component(maxsize=2)
+    def num(i: int) -> Safe:
+        return text(i)
+
+    for i in (1, 2, 1, 3):
+        num(i)
+    assert num.cache_info().currsize == 2
+    num(1)
+    assert num.cache_info().hits == 2  # 1 is most recently used, 2 was evicted
+    num(2)
+    assert num.cache_info().misses == 4
+
+    # equal arguments of different types are cached apart
+    @component
+    def qty(n: float) -> Safe:
+        return text(n)
+
+    one = True
+    assert (qty(1), qty(one), qty(1.0), qty(n=1), qty(n=one)) == ("1", "", "1.0", "1", "")
+    assert qty.cache_info().currsize == 5
+    assert qty.invalidate(one) and not qty.invalidate(one)
+
+    @component(maxsize=None, maxbytes=sys.getsizeof(Safe("x" * 10)) * 2)
+    def big(n: int) -> Safe:
+        return Safe("x" * n)
+
+    big(10)
+    big(10)
+    big(100)  # exceeds the budget alone
+    assert big.cache_info()[:4] == (1, 2, 0, 1)
+    big(5)
+    big(6)
+    assert big.cache_info().currsize == 2
+
+    # non-Safe results are not cached
+    @component
+    def plain() -> Safe:
+        return "plain"  # type: ignore
+
+    plain()
+    plain()
+    assert plain.cache_info().currsize == 0
+
+
+def test_cached_html():
+    calls = []
+
+    class Chip:
+        def __init__(self, name: str):
+            self.name = name
+
+        @cached_html
+        def __html__(self):
+            calls.append(self.name)
+            return markup(f"<span>{ text(self.name) }</span>")
+
+    class SlottedChip:
+        __slots__ = ("_htmf_html", "name")
+
+        def __init__(self, name: str):
+            self.name = name
+
+        @cached_html
+        def __html__(self):
+            calls.append(self.name)
+            return f"<i>{ self.name }</i>"
+
+    class NoSlot:
+        __slots__ = ("name",)
+
+        @cached_html
+        def __html__(self):
+            return ""
+
+    @dataclass(frozen=True)
+    class Frozen:
+        name: str
+
+        @cached_html
+        def __html__(self):
+            calls.append(self.name)
+            return self.name
+
+    chip = Chip("<a>")
+    assert text(chip, chip, [chip]) == "<span>&lt;a&gt;</span>" * 3
+    assert calls == ["<a>"]
+    assert isinstance(chip.__html__(), Safe)
+    chip.name = "b"
+    invalidate_html(chip)
+    invalidate_html(chip)
+    assert text(chip) == "<span>b</span>"
+    assert calls == ["<a>", "b"]
+
+    slotted = SlottedChip("s")
+    assert text(slotted, slotted) == "<i>s</i><i>s</i>"
+    invalidate_html(slotted)
+    assert text(slotted) == "<i>s</i>"
+    assert calls == ["<a>", "b", "s", "s"]
+    invalidate_html(object())
+
+    frozen = Frozen("f")
+    assert text(frozen, frozen) == "ff"
+    assert calls[-1:] == ["f"] and calls.count("f") == 1
+
+    try:
+        text(NoSlot())
+        raise AssertionError("should fail")
+    except TypeError as e:
+        assert "_htmf_html" in str(e)
+
+
+def test_parallel():
+    import pickle
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    from functools import partial
+
+    for val in (Safe("<b>&amp;</b>"), ClassList("a", "<b>")):
+        restored = pickle.loads(pickle.dumps(val))
+        assert restored == val
+        assert type(restored) is type(val)
+    assert text(pickle.loads(pickle.dumps(Safe("<b>")))) == "<b>"
+
+    sections = [partial(text, i, "<b>") for i in range(50)] + [lambda: ["<i>", Safe("<u>")]]
+    expected = [text(section()) for section in sections]
+    assert parallel(sections) == expected
+    assert all(isinstance(res, Safe) for res in parallel(sections))
+    assert parallel([]) == []
+    with ThreadPoolExecutor(2) as pool:
+        assert parallel(iter(sections), pool) == expected
+    assert text(parallel(sections)) == text(expected)
+
+    with ProcessPoolExecutor(2) as pool:
+        res = parallel(sections[:-1], pool)
+        assert res == expected[:-1]
+        assert type(res[0]) is Safe
+        assert parallel(sections[:-1], pool, chunksize=7) == expected[:-1]
+
+
+def test_table():
+    columns = {
+        "name": ["<a>", "b", "<a>", Safe("<i>x</i>"), "b", "b"],
+        "qty": [1, 2, 3, 40, 5, 6],
+        "price": [0.1, 2.5, 1e20, 3.0, -1.0, 7],
+        "mixed": [None, True, HtmlDunder("<b>"), ["x", "<y>"], 5, "z"],
+        "sold & <out>": [False] * 6,
+    }
+    headers = {"qty": "Qty <n>"}
+
+    def reference(columns, headers={}, attrs=None, cell_attrs={}):  # noqa: B006
+        def th(key):
+            return markup(f"<th>{ text(headers.get(key, key)) }</th>")
+
+        def td(key, val):
+            a = attr(cell_attrs.get(key))
+            return markup(f"<td{ ' ' + a if a else '' }>{ text(val) }</td>")
+
+        def tr(row):
+            return markup(f"<tr>{ text(td(k, v) for k, v in zip(columns, row)) }</tr>")
+
+        a = attr(attrs)
+        return markup(
+            f"""
+            <table{ ' ' + a if a else '' }><thead><tr>{ text(th(k) for k in columns) }</tr></thead><tbody>{
+                text(tr(row) for row in zip(*columns.values()))
+            }</tbody></table>
+            """
+        )
+
+    assert table(columns) == reference(columns)
+    assert table(columns, headers=headers) == reference(columns, headers)
+    cell_attrs = {"qty": {"class": "num", "style": "width: 10%"}}
+    res = table(columns, attrs={"class": "report"}, cell_attrs=cell_attrs)
+    assert res == reference(columns, {}, {"class": "report"}, cell_attrs)
+    assert isinstance(res, Safe)
+
+    # large columns take the batch paths
+    big = {
+        "status": ["active", "<pending>", "Tom & Jerry"] * 100,
+        "name": [f"user <{ i }>" for i in range(300)],
+        "amount": [i * 1.5 for i in range(300)],
+    }
+    assert table(big) == reference(big)
+    assert table({}) == "<table><thead><tr></tr></thead><tbody></tbody></table>"
+
+    try:
+        table({"a": [1], "b": [1, 2]})
+        raise AssertionError("should fail")
+    except ValueError:
+        pass
+
+    class Column:  # duck-typed NumPy array
+        def __init__(self, vals):
+            self.vals = vals
+
+        def __len__(self):
+            return len(self.vals)
+
+        def tolist(self):
+            return list(self.vals)
+
+    assert table({"n": Column([1, 2]), "s": Column(["<a>", "b"])}) == reference({"n": [1, 2], "s": ["<a>", "b"]})
+
+
+def test_register():
+    import datetime
+    import enum
+    from decimal import Decimal
+
+    class Color(enum.Enum):
+        RED = "<red>"
+
+    @dataclass
+    class Point:
+        x: int
+        y: int
+
+    class Money(tuple):
+        pass
+
+    class Dynamic:
+        def __getattr__(self, name):
+            if name == "__html__":
+                return lambda: "<dyn>"
+            raise AttributeError(name)
+
+    # not rendered by default, nothing changes until registered
+    args = (Decimal("1.50"), datetime.date(2024, 5, 1), Color.RED, Point(1, 2), [Decimal(1)], "a")
+    assert text(*args) == "a"
+    assert text(Dynamic(), [Dynamic()]) == "<dyn><dyn>"
+    obj = BadArg()
+    obj.__html__ = lambda: "<own>"
+    assert text(BadArg(), obj, BadArg(), [obj]) == "<own><own>"
+
+    try:
+        register(Decimal, str)
+        register(datetime.date, datetime.date.isoformat)
+        register(enum.Enum, lambda e: e.value)
+        register(Point, lambda p: [markup("<i>"), p.x, ",", p.y, markup("</i>")])
+        assert text(*args) == "1.502024-05-01&lt;red&gt;<i>1,2</i>1a"
+        assert text(datetime.datetime(2024, 5, 1, 10)) == "2024-05-01"  # subclass
+        assert attr(price=Decimal("9.99"), color=Color.RED) == 'color="&lt;red&gt;" price="9.99"'
+        assert classname("a", Color.RED, [Decimal(2)]) == "a &lt;red&gt; 2"
+        assert rope(Decimal(3), [Color.RED]).flatten() == "3&lt;red&gt;"
+        assert "".join(iter_text(Decimal(3))) == "3"
+        # atext follows the same dispatch, the registered iterables are rendered too
+        register(Money, lambda m: f"${ m[0] }")
+        async def price():
+            return Money((7,))
+
+        assert asyncio.run(atext(Decimal("1.5"), Money((5,)), [Color.RED, Money((6,))], price())) == text(
+            Decimal("1.5"), Money((5,)), [Color.RED, Money((6,))], Money((7,))
+        )
+        assert text(Money((5,))) == "$5"
+        # strings and numbers are rendered first
+        register(str, lambda s: "never")
+        register(int, lambda s: "never")
+        assert text("x", 1) == "x1"
+    finally:
+        for tp in (Decimal, datetime.date, enum.Enum, Point, str, int, Money):
+            register(tp, None)
+    assert text(*args) == "a"
@@ -0,0 +1,148 @@
+from dataclasses import dataclass
+from sys import getsizeof
+
+import pytest
+
+import htmf as ht
+from htmf import Safe
+from htmf import cache
+from htmf.cache import fragment, invalidate, invalidate_tag
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    cache.cache_clear()
+    yield
+    cache.cache_clear()
+    cache.configure()
+
+
+@dataclass(frozen=True)
+class Product:
+    id: int
+    version: int
+    name: str
+
+
+def test_decorator():
+    calls = []
+
+    @fragment(lambda p: ("product", p.id, p.version), tags=lambda p: [f"product:{ p.id }"])
+    def card(p: Product):
+        calls.append(p)
+        return ht.m(f"<div>{ ht.t(p.name) }</div>")
+
+    p = Product(1, 1, "<a>")
+    assert card(p) == "<div>&lt;a&gt;</div>"
+    assert card(p) is card(p)
+    assert len(calls) == 1
+    assert card(Product(1, 2, "b")) == "<div>b</div>"  # new version, new key
+    assert len(calls) == 2
+
+    assert invalidate_tag("product:1") == 2
+    assert invalidate_tag("product:1") == 0
+    card(p)
+    assert len(calls) == 3
+
+    info = cache.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (2, 3, 1)
+    assert info.hit_rate == 2 / 5
+    assert info.bytes_served == 2 * getsizeof(card(p))
+
+    # non-Safe results are not cached
+    @fragment("plain")
+    def plain():
+        calls.append(None)
+        return "<b>"
+
+    plain()
+    plain()
+    assert calls[-2:] == [None, None]
+
+
+def test_context_manager():
+    with fragment(("sidebar", 1), tags=["user:1"]) as f:
+        assert not f.hit
+        assert f.value is None
+        first = f.set(ht.m("<nav></nav>"))
+    with fragment(("sidebar", 1)) as f:
+        assert f.hit
+        assert f.value is first
+        # the rendered value is ignored on hit
+        assert f.set(ht.m("<other/>")) == "<other/>"
+        assert f.value == "<other/>"
+    assert invalidate(("sidebar", 1))
+    assert not invalidate(("sidebar", 1))
+    assert cache.cache_info().currsize == 0
+
+    with pytest.raises(TypeError), fragment(lambda: "key"):
+        pass
+
+
+def test_ttl(monkeypatch: pytest.MonkeyPatch):
+    now = [100.0]
+    monkeypatch.setattr(cache, "_clock", lambda: now[0])
+
+    with fragment("k", ttl=10) as f:
+        f.set(Safe("v"))
+    now[0] = 109.0
+    with fragment("k") as f:
+        assert f.hit
+    now[0] = 110.0
+    with fragment("k") as f:
+        assert not f.hit
+    assert cache.cache_info().currsize == 0
+
+
+def test_dedupe_and_budget():
+    value = ht.m("<p>" + "x" * 1000 + "</p>")
+    size = getsizeof(value)
+    for i in range(3):
+        with fragment(("same", i), tags=["same"]) as f:
+            f.set(Safe(str(value)))  # equal, but distinct object
+    info = cache.cache_info()
+    assert (info.currsize, info.payloads) == (3, 1)
+    assert info.currbytes == size
+    assert info.bytes_deduped == 2 * size
+
+    invalidate(("same", 0))
+    assert cache.cache_info().bytes_deduped == size
+    assert invalidate_tag("same") == 2
+    info = cache.cache_info()
+    assert (info.currsize, info.payloads, info.currbytes, info.bytes_deduped) == (0, 0, 0, 0)
+
+    # LRU eviction by the byte budget
+    cache.configure(maxbytes=size * 2 + 10)
+    for i in range(3):
+        with fragment(i) as f:
+            f.set(Safe(str(i) * 1000))
+    with fragment(1) as f:  # touch
+        assert f.hit
+    with fragment(3) as f:
+        f.set(Safe("3" * 1000))
+    keys = []
+    for i in range(4):
+        with fragment(i) as f:
+            if f.hit:
+                keys.append(i)
+    assert keys == [1, 3]
+
+    # too large payloads are not stored
+    with fragment("huge") as f:
+        f.set(Safe("h" * 10_000))
+    assert not invalidate("huge")
+
+    # and drop the stale value of the key, e.g. rendered by the concurrent miss
+    cache._store.put("huge", Safe("small"), None, ())
+    cache._store.put("huge", Safe("h" * 10_000), None, ())
+    assert not invalidate("huge")
+
+
+def test_tags_generator():
+    @fragment(lambda i: ("gen", i), tags=(t for t in ["gen"]))
+    def item(i: int):
+        return ht.t(i)
+
+    item(1)
+    item(2)
+    assert invalidate_tag("gen") == 2
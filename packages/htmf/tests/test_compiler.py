@@ -0,0 +1,278 @@
+import ast
+import importlib
+import re
+import sys
+import textwrap
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import htmf as ht
+from htmf import Safe
+from htmf import compiler
+
+SOURCE = '''
+"""Module docstring"""
+
+from __future__ import annotations
+
+import htmf as ht
+
+
+def literal():
+    return ht.m("""
+        <div>  literal </div>
+    """)
+
+
+def same_literal():
+    return ht.markup("<div>  literal </div>")
+
+
+def fstring(name: str):
+    return ht.m(f"""
+        <div class="{ ht.c('a', 'b') }">
+            { ht.t(name) }
+        </div>
+    """)
+
+
+def edges(val):
+    return ht.m(f"  { val }  ")
+
+
+def left_edge(val):
+    return ht.m(f"{ val } <span>")
+
+
+def blank():
+    return ht.m(f"   ")
+
+
+def nested(items):
+    return ht.document(f"<ul>{ ht.t(ht.m(f' <li>{ ht.t(i) }</li> ') for i in items) }</ul>")
+
+
+def untouched(s):
+    return ht.m(s), ht.m(*[s]), ht.t(" keep ")
+
+
+class Widget:
+    __slots__ = ()
+
+    def render(self):
+        return ht.m("<p>in class</p>")
+'''
+
+
+def load(source: str, name: str):
+    tree = compiler.transform(ast.parse(source))
+    mod = type(sys)(name)
+    exec(compile(tree, name, "exec"), mod.__dict__)
+    return mod
+
+
+def test_transform():
+    plain = type(sys)("plain")
+    exec(compile(SOURCE, "plain", "exec"), plain.__dict__)
+    compiled = load(SOURCE, "compiled")
+
+    for name, args in [
+        ("literal", ()),
+        ("same_literal", ()),
+        ("fstring", ("<joe>",)),
+        ("edges", (" x ",)),
+        ("edges", (ht.m("<b>"),)),
+        ("left_edge", ("  y",)),
+        ("blank", ()),
+        ("nested", (["<a>", "b"],)),
+        ("untouched", ("  s  ",)),
+    ]:
+        expected = getattr(plain, name)(*args)
+        res = getattr(compiled, name)(*args)
+        assert res == expected
+        assert type(res) is type(expected)
+    assert compiled.Widget().render() == plain.Widget().render()
+
+    # literals are hoisted into the shared constants
+    assert compiled.literal() is compiled.literal()
+    assert compiled.literal() is compiled.same_literal()
+    # long ones are static, encoded once
+    big = load(f"import htmf as ht\n\ndef f():\n    return ht.m('<p>{ 'x' * 300 }</p>')\n", "big")
+    first = list(ht.iter_text(ht.FLUSH, big.f(), ht.FLUSH, encoding="utf-8"))
+    assert first[0] is next(ht.iter_text(big.f(), encoding="utf-8"))
+    assert compiled.__doc__ == "Module docstring"
+
+    code = ast.unparse(compiler.transform(ast.parse(SOURCE)))
+    assert "ht.m(" not in code.replace("ht.m(s)", "").replace("ht.m(*[s])", "")
+    assert ".strip()" in code  # for the edges
+
+
+def test_transform_custom_trigger():
+    mod = load("import htmf\nmy = htmf.markup\n\ndef f():\n    return my(' <a> ')\n", "custom")
+    assert mod.f() == "<a>"
+    tree = compiler.transform(ast.parse("def f():\n    return my(' <a> ')\n"), trigger=r"my")
+    assert "my(" not in ast.unparse(tree)
+
+
+@pytest.fixture
+def package(tmp_path: Path):
+    pkg = tmp_path / "htmf_compiled_pkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("")
+    (pkg / "views.py").write_text(SOURCE)
+    (pkg / "other.py").write_text("def f():\n    return 1\n")
+    sys.path.insert(0, str(tmp_path))
+    try:
+        yield pkg
+    finally:
+        compiler.uninstall()
+        sys.path.remove(str(tmp_path))
+        for name in [n for n in sys.modules if n.startswith(pkg.name)]:
+            del sys.modules[name]
+
+
+def test_import_hook(package: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+    compiler.install(package.name)
+    compiler.install(package.name)  # replaces
+    assert sum(isinstance(f, compiler._Finder) for f in sys.meta_path) == 1
+
+    views = importlib.import_module(f"{ package.name }.views")
+    assert views.fstring("<joe>") == ht.m(
+        f"""
+        <div class="{ ht.c('a', 'b') }">
+            { ht.t("<joe>") }
+        </div>
+        """
+    )
+    assert views.literal() is views.same_literal()
+    assert isinstance(views.fstring("a"), Safe)
+    assert importlib.import_module(f"{ package.name }.other").f() == 1
+
+    cached = list((package / "__pycache__").glob("views.*.opt-htmf*.pyc"))
+    assert len(cached) == 1
+    assert not list((package / "__pycache__").glob("other.*.opt-htmf*.pyc"))
+
+    # the second import is served from the cache
+    transform = compiler.transform
+
+    def fail(*args, **kwargs):
+        raise AssertionError("should not transform")
+
+    del sys.modules[f"{ package.name }.views"]
+    monkeypatch.setattr(compiler, "transform", fail)
+    views = importlib.import_module(f"{ package.name }.views")
+    assert views.literal() is views.same_literal()
+
+    # the stale cache is ignored
+    (package / "views.py").write_text(SOURCE + "\n\ndef extra():\n    return ht.m(' <i> ')\n")
+    del sys.modules[f"{ package.name }.views"]
+    monkeypatch.setattr(compiler, "transform", transform)
+    views = importlib.import_module(f"{ package.name }.views")
+    assert views.extra() == "<i>"
+
+    # the cache is per trigger and optimization level
+    compiler.install(package.name, trigger=r"ht\.m")
+    del sys.modules[f"{ package.name }.views"]
+    views = importlib.import_module(f"{ package.name }.views")
+    assert views.extra() == "<i>"
+    assert len(list((package / "__pycache__").glob("views.*.opt-htmf*.pyc"))) == 2
+    tag = compiler._cache_tag(re.compile(r"ht\.m"), minify=False)
+    assert tag.isalnum()
+    monkeypatch.setattr(sys, "flags", SimpleNamespace(optimize=2))
+    assert compiler._cache_tag(re.compile(r"ht\.m"), minify=False) != tag
+
+
+def test_uninstall(package: Path):
+    compiler.install("some_other_package")
+    compiler.uninstall()
+    assert not any(isinstance(f, compiler._Finder) for f in sys.meta_path)
+    views = importlib.import_module(f"{ package.name }.views")
+    assert views.literal() is not views.literal()
+    assert not (package / "__pycache__").exists() or not list((package / "__pycache__").glob("*.opt-htmf*.pyc"))
+
+
+def test_line_numbers():
+    source = textwrap.dedent(
+        """
+        import htmf as ht
+
+        def f():
+            return ht.m(f"<a>{ 1 / 0 }</a>")
+        """
+    )
+    mod = load(source, "lines")
+    with pytest.raises(ZeroDivisionError) as e:
+        mod.f()
+    assert e.traceback[-1].lineno + 1 == 5
+
+
+MINIFY_SOURCE = '''
+import htmf as ht
+
+
+def page(title, code):
+    return ht.m(f"""
+        <div   class="a  b"
+             id='x  y'>
+            <h1>  { title }  </h1>
+            <pre>
+  keep   { code }
+            </pre>
+            <p>a\xa0 b</p>
+            <textarea name="t">  x  </textarea>
+            <script>let  s = "  ";</script>
+            <style>
+                a  {{ color: red }}
+            </style>
+        </div>
+    """)
+
+
+def literal():
+    return ht.m("""
+        <ul>
+            <li>  one  </li>
+        </ul>
+    """)
+'''
+
+
+def test_minify():
+    tree = compiler.transform(ast.parse(MINIFY_SOURCE), minify=True)
+    mod = type(sys)("minified")
+    exec(compile(tree, "minified", "exec"), mod.__dict__)
+
+    assert mod.literal() == "<ul> <li> one </li> </ul>"
+    res = mod.page("  t  ", "a\n  b")
+    assert isinstance(res, Safe)
+    assert res == (
+        """<div class="a  b" id='x  y'> <h1>   t   </h1> <pre>\n  keep   a\n  b\n            </pre> """
+        """<p>a\xa0 b</p> <textarea name="t">  x  </textarea> <script>let  s = "  ";</script> """
+        """<style>\n                a  { color: red }\n            </style> </div>"""
+    )
+
+    plain = load(MINIFY_SOURCE, "not_minified")
+    assert len(res) < len(plain.page("  t  ", "a\n  b")) * 0.85
+
+
+def test_minify_edge_cases():
+    minifier = compiler._Minifier()
+    # the state is kept across the parts split by the interpolated values
+    assert minifier.feed("<a  href='  ") == "<a href='  "
+    assert minifier.feed("  '  >  <PRE  class=x>  ") == "  ' > <PRE class=x>  "
+    assert minifier.feed("  </pre  >  ") == "  </pre > "
+    assert compiler._Minifier().feed("<pre>  </prefix>  </pre>  ") == "<pre>  </prefix>  </pre> "
+    assert compiler._Minifier().feed("1 <  2\n\n3") == "1 < 2 3"
+    # comments and declarations are skipped whole, quotes inside don't matter
+    assert (
+        compiler._Minifier().feed("<!-- don't  touch -->\n<pre>it's   aligned\n   like  this</pre>")
+        == "<!-- don't  touch --> <pre>it's   aligned\n   like  this</pre>"
+    )
+    res = compiler._Minifier().feed("<!DOCTYPE  html>\n<?xml  ?>  <!--> x  y")
+    assert res == "<!DOCTYPE  html> <?xml  ?> <!--> x y"
+    minifier = compiler._Minifier()
+    assert minifier.feed("<!--  a ") == "<!--  a "
+    assert minifier.feed(" b  -->  <pre>  </pre>") == " b  --> <pre>  </pre>"
@@ -0,0 +1,122 @@
+"""
+Differential fuzzing of the escaping contexts against the reference escaping and the stdlib HTML parser.
+"""
+
+import html
+import random
+import re
+from html.parser import HTMLParser
+
+import pytest
+
+import htmf as ht
+
+N = 2000
+
+# the markup-significant characters are frequent, the rest is any text incl. control and non-ASCII ones
+ALPHABET = "&<>\"'=/ \t\n\r\f\x00\x0b;#x" + "abc123" + "é€ж😀\u00a0\u2028"
+
+
+def random_strings(seed: int) -> list[str]:
+    rnd = random.Random(seed)
+    return ["".join(rnd.choices(ALPHABET, k=rnd.randint(0, 24))) for _ in range(N)]
+
+
+STRINGS = [*random_strings(42), "", "&amp;", "&lt;script&gt;", "</p>", "<!--", "]]>", "a=b c", " x "]
+
+_REF_RE = re.compile(r"""[&<>"']""")
+_REF_MAP = {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}
+
+
+def reference(s: str) -> str:
+    """The regex escaping of the htmf before the contexts"""
+    return _REF_RE.sub(lambda m: _REF_MAP[m[0]], s)
+
+
+class Parsed(HTMLParser):
+    def __init__(self, markup: str):
+        super().__init__(convert_charrefs=True)
+        self.tags: list[tuple[str, list[tuple[str, str | None]]]] = []
+        self.data: list[str] = []
+        self.feed(markup)
+        self.close()
+
+    def handle_starttag(self, tag, attrs):
+        self.tags.append((tag, attrs))
+
+    def handle_data(self, data):
+        self.data.append(data)
+
+
+def parse(markup: str) -> Parsed:
+    return Parsed(markup)
+
+
+@pytest.mark.parametrize("context", ["html", "text", "attr_value", "attr_name"])
+def test_unescape_roundtrip(context):
+    for s in STRINGS:
+        res = ht.escape(s, context)
+        assert isinstance(res, ht.Safe)
+        if context == "attr_name" and re.search(r"[\x00-\x08\x0b\x0e-\x1f\x7f]", s):
+            continue  # references to the control characters are not decoded
+        assert html.unescape(res) == (s.strip() if context == "attr_name" else s), repr(s)
+
+
+def test_html():
+    for s in STRINGS:
+        assert ht.escape(s) == reference(s) == html.escape(s).replace("&#x27;", "&#39;")
+        assert not set(ht.escape(s)) & set("<>\"'")
+
+
+def test_text():
+    for s in STRINGS:
+        res = ht.escape(s, "text")
+        assert "<" not in res and ">" not in res
+        p = parse(f"<p>{ res }</p>")
+        assert [t for t, _ in p.tags] == ["p"]
+        assert "".join(p.data) == s, repr(s)
+
+
+def test_attr_value():
+    for s in STRINGS:
+        res = ht.escape(s, "attr_value")
+        assert '"' not in res
+        assert parse(f'<p title="{ res }">').tags == [("p", [("title", s)])], repr(s)
+
+
+def test_attr_name():
+    for s in STRINGS:
+        res = ht.escape(s, "attr_name")
+        if not res:
+            continue
+        assert not re.search(r"""[\s"'<>/=]""", res)
+        tags = parse(f'<p { res }="v" id="x">').tags
+        assert tags == [("p", [(res.lower(), "v"), ("id", "x")])], repr(s)
+
+
+def test_context():
+    assert ht.escape("<'a' & \"b\">", "text") == "&lt;'a' &amp; \"b\"&gt;"
+    assert ht.escape("<'a' & \"b\">", "attr_value") == "<'a' &amp; &quot;b&quot;>"
+    assert ht.escape(" a b=c/ ", "attr_name") == "a&#32;b&#61;c&#47;"
+    assert ht.escape(ht.Safe("<b>"), "text") == "<b>"
+    with pytest.raises(ValueError):
+        ht.escape("a", "css")  # type: ignore[arg-type]
+
+
+def test_helpers_unchanged():
+    # the text output lands in the attributes quoted either way too, so it's the html context
+    for s in STRINGS:
+        assert ht.text(s) == reference(s)
+        assert ht.escape_many([s] * 10) == [reference(s)] * 10
+        p = parse(f"<p title='{ ht.text(s) }' { ht.attr(title2=s) }>")
+        assert p.tags == [("p", [("title", s), ("title2", s)])], repr(s)
+
+
+def test_attr_names():
+    for s in STRINGS:
+        res = ht.attr({s: "v", "id": "x"})
+        name = ht.escape(s, "attr_name")
+        pairs = {s: f'{ name }="v"' if name else "", "id": 'id="x"'}
+        assert res == " ".join(pairs[k] for k in sorted(pairs) if pairs[k])
+        tags = parse(f"<p { res }>").tags
+        assert len(tags) == 1 and ("id", "x") in tags[0][1], repr(s)
@@ -0,0 +1,87 @@
+import gc
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import htmf as ht
+from htmf import instrument
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    instrument.reset()
+    yield
+    instrument.disable()
+    instrument.reset()
+
+
+def test_swap():
+    originals = (ht.text, ht.t, ht.attr, ht.classname, ht.c, ht._esc, ht._attr_esc)
+    instrument.enable()
+    assert instrument.enabled()
+    assert ht.t is ht.text is not originals[0]
+    assert ht.c is ht.classname is not originals[3]
+    instrument.enable()  # no-op
+    instrument.disable()
+    assert not instrument.enabled()
+    assert (ht.text, ht.t, ht.attr, ht.classname, ht.c, ht._esc, ht._attr_esc) == originals
+
+
+def test_counters():
+    instrument.enable()
+    assert ht.t("<a>", "b", 1) == "&lt;a&gt;b1"
+    assert ht.t("ж") == "ж"
+    assert ht.attr({"id": "x", "title": '<"'}, hidden=True) == 'hidden id="x" title="<&quot;"'
+    assert ht.c("a", "b") == "a b"
+    assert ht.escape("plain") == "plain"
+    assert isinstance(ht.t("a"), ht.Safe)
+
+    st = instrument.stats()
+    assert st["text"].calls == 3
+    assert st["text"].args == 5
+    assert st["text"].bytes == len("&lt;a&gt;b1") + 2 + 1  # UTF-8
+    assert st["attr"].calls == 1
+    assert st["attr"].args == 3
+    assert st["classname"].calls == 1
+    assert st["escape"].escaped == 2  # "<a>" and '<"'
+    assert st["escape"].calls >= 5
+    assert all(s.seconds >= 0 for s in st.values())
+
+    # stats are summed over threads
+    thread = threading.Thread(target=lambda: ht.t("x"))
+    thread.start()
+    thread.join()
+    assert instrument.stats()["text"].calls == 4
+
+    # nothing is counted when disabled
+    instrument.disable()
+    ht.t("x")
+    assert instrument.stats()["text"].calls == 4
+
+    instrument.reset()
+    assert instrument.stats()["text"] == instrument.HelperStats(0, 0, 0, 0, 0.0)
+
+
+def test_foreign_swap_kept():
+    instrument.enable()
+    ht.enable_escape_cache()
+    try:
+        instrument.disable()
+        assert ht.escape_cache_info() is not None
+    finally:
+        ht.disable_escape_cache()
+
+
+def test_finished_threads_folded():
+    instrument.enable()
+    running = len(instrument._registry)
+    for _ in range(3):
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(ht.t, range(40)))
+    gc.collect()
+    assert len(instrument._registry) == running
+    assert instrument.stats()["text"].calls == 120
+
+    instrument.reset()
+    assert instrument.stats()["text"].calls == 0
@@ -0,0 +1,184 @@
+"""
+Shared state under the concurrent rendering: caches evicting and the registries changing while rendering.
+"""
+
+import threading
+from dataclasses import dataclass
+
+import htmf as ht
+from htmf import cache
+
+N_THREADS = 8
+N_ITERS = 200
+
+
+@dataclass(frozen=True)
+class Item:
+    id: int
+    name: str
+
+
+class Price:
+    def __init__(self, cents: int):
+        self.cents = cents
+
+    def __html__(self):
+        return f"<b>{ self.cents / 100:.2f}</b>"
+
+
+@ht.component(maxsize=8)  # smaller than the working set, keeps evicting
+def row(item: Item):
+    return ht.m(
+        f"<tr { ht.attr(id=f'row-{ item.id }', data_item=ht.json_attr(item, cache=True)) }>"
+        f"<td class='{ ht.c('name', item.id % 2 and 'odd') }'>{ ht.t(item.name) }</td>"
+        f"<td>{ ht.t(Price(item.id * 101)) }</td></tr>"
+    )
+
+
+def page(n: int):
+    items = [Item(i, f"<item { i }>") for i in range(n, n + 32)]
+    with cache.fragment(("footer", n % 4)) as f:
+        footer = f.value if f.hit else f.set(ht.m(f"<footer>{ ht.t('page', n % 4) }</footer>"))
+    return ht.m(f"<table>{ ht.t(row(item) for item in items) }</table>{ footer }")
+
+
+def run_threads(target):
+    errors: list[BaseException] = []
+    barrier = threading.Barrier(N_THREADS)
+
+    def worker(i: int):
+        barrier.wait()
+        try:
+            target(i)
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(N_THREADS)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert not errors, errors
+
+
+def test_concurrent_render():
+    expected = {n: page(n) for n in range(16)}
+    ht.enable_escape_cache(maxsize=16)
+    ht.enable_classname_cache(maxsize=2)
+    try:
+
+        def render(i: int):
+            for j in range(N_ITERS):
+                n = (i + j) % 16
+                assert page(n) == expected[n]
+
+        run_threads(render)
+        info = row.cache_info()
+        assert info.currsize <= 8
+        assert 0 < info.hits + info.misses <= N_THREADS * N_ITERS * 32 + 16 * 32
+    finally:
+        ht.disable_escape_cache()
+        ht.disable_classname_cache()
+        row.cache_clear()
+        cache.cache_clear()
+
+
+def test_concurrent_register():
+    class Tag:
+        pass
+
+    renderers = [lambda _: "<tag>", lambda _: ht.m("<tag>")]
+
+    def render(i: int):
+        for j in range(N_ITERS):
+            if i == 0:
+                ht.register(Tag, renderers[j % 2])
+            res = ht.t(Tag(), "x")
+            assert res in ("&lt;tag&gt;x", "<tag>x", "&lt;last&gt;x"), res
+        if i == 0:
+            ht.register(Tag, lambda _: "<last>")
+
+    ht.register(Tag, renderers[0])
+    try:
+        run_threads(render)
+        # no stale renderer is cached by the renders racing the registration
+        assert ht.t(Tag()) == "&lt;last&gt;"
+    finally:
+        ht.register(Tag, None)
+
+
+def test_sharded_lru():
+    assert [(s.maxsize, s.maxbytes) for s in ht._ShardedLRU(30, 1000, 4).shards] == [(8, 250)] * 4
+
+    lru = ht._ShardedLRU(32, None, 4)
+    for i in range(64):
+        lru.put(i, str(i))
+    assert lru.get(63) == "63"
+    assert lru.get(0) is None
+    assert lru.discard(63)
+    assert not lru.discard(63)
+    lru.bypass()
+    info = lru.info()
+    assert (info.hits, info.misses, info.bypassed, info.currsize, info.maxsize) == (1, 1, 1, 31, 32)
+    assert info.currbytes > 0
+    assert all(len(s.data) <= 8 for s in lru.shards)
+
+    try:
+        lru.get([])
+    except TypeError:
+        pass
+    else:
+        raise AssertionError
+
+    lru.clear()
+    assert lru.info() == (0, 0, 0, 0, 32, 0, None)
+
+    # bypasses are counted by the shard of the thread
+    run_threads(lambda i: lru.bypass())
+    assert lru.info().bypassed == N_THREADS
+
+
+def test_sharded_store():
+    store = cache._ShardedStore(400_000, 4)
+    assert [s.maxbytes for s in store.shards] == [100_000] * 4
+    for i in range(64):
+        store.put(i, ht.Safe(f"<p>{ i }</p>"), None, ("even" if i % 2 else "odd", "all"))
+    entry = store.get(63)
+    assert entry and entry.value == "<p>63</p>"
+    assert store.get(-1) is None
+    assert all(s.entries for s in store.shards)
+    assert store.discard(63)
+    assert not store.discard(63)
+    assert store.discard_tag("even") == 31
+    info = store.info()
+    assert (info.hits, info.misses, info.currsize, info.maxbytes) == (1, 1, 32, 400_000)
+
+    store.configure(None)
+    assert [s.maxbytes for s in store.shards] == [None] * 4
+    assert store.discard_tag("all") == 32
+    store.clear()
+    assert store.info() == (0, 0, 0, 0, 0, None, 0, 0)
+
+
+def test_cache_counters():
+    ht.enable_escape_cache(maxsize=4, max_length=8)
+    ht.enable_classname_cache(maxsize=4)
+    try:
+
+        def render(i: int):
+            for j in range(N_ITERS):
+                ht.t(f"<{ j % 8 }>", "long <string>")
+                ht.attr(title=f"<{ j % 8 }>")
+                ht.c("a", f"b{ j % 8 }")
+
+        run_threads(render)
+        # each thread counts into its own counters, no update is lost. The finished threads are folded in
+        cn_info = ht.classname_cache_info()
+        assert cn_info and cn_info.hits + cn_info.misses == N_THREADS * N_ITERS
+        info = ht.escape_cache_info()
+        # the text and attr values, plus the two tokens of each classname miss
+        assert info and info.hits + info.misses == N_THREADS * N_ITERS * 2 + cn_info.misses * 2
+        assert info.bypassed == N_THREADS * N_ITERS
+    finally:
+        ht.disable_escape_cache()
+        ht.disable_classname_cache()